@@ -1,12 +1,38 @@
 import os
 import time
 import yaml
-from datetime import datetime
+import numpy as np
+from datetime import datetime, timedelta
 
-from strategy import FiveEMA
+from strategy import LONG, SHORT, FiveEMA, SignalKind
+from positions import Position
 from paper_trader import PaperTrader
 from data_feed import SimulatedFeed, SmartAPIConnector
-from telegram_notifier import TelegramNotifier
+from telegram_notifier import TelegramNotifier, sent_message_ids
+
+
+# Telegram message templates, filled with str.format_map per trade
+ENTRY_TPL = (
+    "📈 <b>RT ENTRY</b>\n"
+    "<b>Symbol:</b> {symbol}\n"
+    "<b>Trade ID:</b> #{trade_id}\n"
+    "<b>Side:</b> {side}\n"
+    "<b>Qty:</b> {qty}\n"
+    "<b>Entry:</b> ₹{entry:,.2f}\n"
+    "<b>SL:</b> ₹{sl:,.2f}\n"
+    "<b>TP:</b> ₹{tp:,.2f}"
+)
+EXIT_TPL = (
+    "📉 <b>RT EXIT</b>\n"
+    "<b>Symbol:</b> {symbol}\n"
+    "<b>Trade ID:</b> #{trade_id} ({signal})\n"
+    "<b>Side:</b> {side}\n"
+    "<b>Qty:</b> {qty}\n"
+    "<b>Entry:</b> ₹{entry:,.2f}\n"
+    "<b>Exit:</b> ₹{exit:,.2f}\n"
+    "<b>Trade P&L:</b> ₹{pnl:,.2f}\n"
+    "<b>Total Equity:</b> ₹{equity:,.2f}"
+)
 
 
 def load_config(path="config.yaml"):
@@ -37,6 +63,16 @@ def save_rt_equity_state(equity, path="rt_equity.yaml"):
         print("Failed to save rt_equity.yaml:", e)
 
 
+def seconds_until_market_open(now, market_start):
+    """Seconds from `now` until `market_start` on the next weekday (Mon-Fri)."""
+    target = datetime.combine(now.date(), market_start)
+    if now >= target:
+        target += timedelta(days=1)
+    while target.weekday() >= 5:
+        target += timedelta(days=1)
+    return (target - now).total_seconds()
+
+
 class CandleBuilder:
     """Build fixed 5min/15min candles aligned to clock multiples from tick prices."""
 
@@ -96,9 +132,11 @@ def main():
 
     trader = PaperTrader(starting_cash=starting_cash, slippage=slippage)
     strategy = FiveEMA(ema_period=5, rr=3.0, max_trades_per_day=5)
+    update_5m = strategy.candle_updater(5)
+    update_15m = strategy.candle_updater(15)
 
     tg_cfg = cfg.get("telegram", {})
-    notifier = None    # will be used directly via notifier.send(...)
+    notifier = None    # will be used directly via notifier.send_async(...)
     if tg_cfg.get("enable", False):
         chat_ids = tg_cfg.get("chat_ids") or tg_cfg.get("chat_id")
         notifier = TelegramNotifier(
@@ -123,6 +161,9 @@ def main():
 
     print(f"Starting bot in {mode} mode for symbols: {symbols}")
     market_prices = {s: None for s in symbols}
+    # the same prices aligned with `symbols` (NaN until the first tick), for
+    # the exit sweep
+    prices = np.full(len(symbols), np.nan)
 
     candle_5m = CandleBuilder(tf_minutes=5)
     candle_15m = CandleBuilder(tf_minutes=15)
@@ -130,8 +171,10 @@ def main():
     last_ltp_ping = 0
     ltp_ping_interval = 600  # 10 minutes
 
-    # (symbol, trade_id) -> info incl entry_msg_ids
+    # (symbol, trade_id) -> Position (incl. entry_msg_ids)
     open_trades = {}
+    # strategy symbol ids, aligned with `symbols`, for exit_signal_vec()
+    sids = strategy.symbol_ids(symbols)
 
     in_market = False
     day_start_equity = None
@@ -143,23 +186,20 @@ def main():
             f"<b>Symbols:</b> {', '.join(symbols)}\n"
             f"<b>Starting Equity:</b> ₹{starting_cash:,.0f}"
         )
-        notifier.send(start_msg)
+        notifier.send_async(start_msg)
+
+    # Market hours: 09:00-16:00 IST
+    market_start = datetime.strptime("09:00", "%H:%M").time()
+    market_end = datetime.strptime("16:00", "%H:%M").time()
 
     try:
         while True:
-            # Skip weekends (Sat=5, Sun=6)
             now = datetime.now()
-            if now.weekday() >= 5:
-                time.sleep(interval)
-                continue
-
-            # Market hours: 09:00-16:00 IST
             current_time = now.time()
-            market_start = datetime.strptime("09:00", "%H:%M").time()
-            market_end = datetime.strptime("16:00", "%H:%M").time()
 
-            # Detect market open/close to send EOD summary and track daily starting equity
-            if market_start <= current_time <= market_end:
+            # Detect market open/close to send EOD summary and track daily starting equity.
+            # Weekends (Sat=5, Sun=6) count as off-hours.
+            if now.weekday() < 5 and market_start <= current_time <= market_end:
                 if not in_market:
                     in_market = True
                     day_start_equity = trader.equity(market_prices)
@@ -176,12 +216,16 @@ def main():
                         f"<b>Net P&L:</b> ₹{net_pnl:,.0f}"
                     )
                     if notifier:
-                        notifier.send(summary)
+                        notifier.send_async(summary)
                     save_rt_equity_state(day_end_equity, rt_state_path)
-                time.sleep(interval)
+                # Off-hours: sleep straight through to the next session open
+                time.sleep(seconds_until_market_open(now, market_start))
                 continue
 
-            for s in symbols:
+            # one wall-clock stamp for every paper trade made in this pass
+            tick_ns = time.time_ns()
+
+            for k, s in enumerate(symbols):
                 try:
                     tick = conn.get_price(s)
                     price = tick["price"]
@@ -191,6 +235,7 @@ def main():
                     continue
 
                 market_prices[s] = price
+                prices[k] = price
 
                 # Build clock-aligned candles
                 completed_5m = candle_5m.update(s, price, ts)
@@ -201,38 +246,35 @@ def main():
                 # 5m signal (short-term)
                 if completed_5m is not None:
                     o, h, l, c = completed_5m
-                    sig_5 = strategy.update_candle(s, o, h, l, c, ts, tf_minutes=5)
+                    sig_5 = update_5m(s, o, h, l, c, ts)
                     if sig_5:
-                        sig_5 = {k: v for k, v in sig_5.items() if k != "symbol"}
                         sig = sig_5
-                        print(f"[{s}] 5m SIGNAL: {sig['signal']}")
+                        print(f"[{s}] 5m SIGNAL: {sig.kind.name}")
 
                 # 15m signal (long-term, overrides 5m)
                 if completed_15m is not None:
                     o2, h2, l2, c2 = completed_15m
-                    sig2 = strategy.update_candle(s, o2, h2, l2, c2, ts, tf_minutes=15)
+                    sig2 = update_15m(s, o2, h2, l2, c2, ts)
                     if sig2:
-                        sig2 = {k: v for k, v in sig2.items() if k != "symbol"}
                         sig = sig2
-                        print(f"[{s}] 15m SIGNAL: {sig['signal']}")
+                        print(f"[{s}] 15m SIGNAL: {sig.kind.name}")
 
-                # ENTRY handling – FiveEMA owns position
-                if sig and sig.get("signal") in ("short_entry", "long_entry"):
+                # ENTRY handling – FiveEMA owns position (update_candle only emits entries)
+                if sig:
                     st = strategy.state[s]
-                    pos = st["position"]
-                    trade_id = sig["trade_id"]
+                    trade_id = sig.trade_id
 
-                    if not pos or pos.get("trade_id") != trade_id:
+                    if not st.has_pos or st.pos_trade_id != trade_id:
                         print(
                             f"[{s}] WARNING: entry signal but no matching position "
-                            f"pos={pos}, sig={sig}"
+                            f"pos_trade_id={st.pos_trade_id if st.has_pos else None}, sig={sig}"
                         )
                         continue
 
-                    entry = sig["entry"]
-                    sl = sig["sl"]
-                    tp = sig["tp"]
-                    side_new = "long" if sig["signal"] == "long_entry" else "short"
+                    entry = sig.entry
+                    sl = sig.sl
+                    tp = sig.tp
+                    side_new = "long" if sig.kind == SignalKind.LONG_ENTRY else "short"
 
                     risk = abs(entry - sl)
                     if risk <= 0:
@@ -244,82 +286,85 @@ def main():
                         continue
 
                     if side_new == "long":
-                        ok, ex_price = trader.buy_market(s, qty, entry)
+                        ok, ex_price = trader.buy_market(s, qty, entry, tick_ns)
                     else:
-                        ok, ex_price = trader.sell_market(s, qty, entry)
+                        ok, ex_price = trader.sell_market(s, qty, entry, tick_ns)
 
                     if ok:
-                        text = (
-                            "📈 <b>RT ENTRY</b>\n"
-                            f"<b>Symbol:</b> {s}\n"
-                            f"<b>Trade ID:</b> #{trade_id}\n"
-                            f"<b>Side:</b> {side_new.upper()}\n"
-                            f"<b>Qty:</b> {qty}\n"
-                            f"<b>Entry:</b> ₹{ex_price:,.2f}\n"
-                            f"<b>SL:</b> ₹{sl:,.2f}\n"
-                            f"<b>TP:</b> ₹{tp:,.2f}"
+                        text = ENTRY_TPL.format_map(
+                            {
+                                "symbol": s,
+                                "trade_id": trade_id,
+                                "side": side_new.upper(),
+                                "qty": qty,
+                                "entry": ex_price,
+                                "sl": sl,
+                                "tp": tp,
+                            }
                         )
-                        entry_msg_ids = {}
+                        entry_msg_ids = None  # Future from notifier.send_async()
                         if notifier:
-                            entry_msg_ids = notifier.send(text)
-                        open_trades[(s, trade_id)] = {
-                            "side": side_new,
-                            "qty": qty,
-                            "entry": ex_price,
-                            "sl": sl,
-                            "tp": tp,
-                            "entry_msg_ids": entry_msg_ids,
-                        }
+                            entry_msg_ids = notifier.send_async(text)
+                        open_trades[(s, trade_id)] = Position(
+                            LONG if side_new == "long" else SHORT,
+                            qty, ex_price, sl, tp, trade_id, entry_msg_ids,
+                        )
 
-                # EXIT handling – FiveEMA owns position
-                st = strategy.state[s]
-                if st["position"] is not None:
-                    exit_sig = strategy.exit_signal(s, price)
-                else:
-                    exit_sig = None
+            # EXIT handling – FiveEMA owns position. One vectorized SL/TP sweep
+            # over all symbols (no price yet -> NaN, never exits), skipped
+            # with no open trades; exit_signal() only runs for the hits.
+            hits = strategy.exit_signal_vec(sids, prices) if open_trades else ()
+            for k in np.flatnonzero(hits):
+                s = symbols[k]
+                exit_sig = strategy.exit_signal(s, market_prices[s])
 
-                if exit_sig and exit_sig.get("signal"):
-                    exit_sig = {k: v for k, v in exit_sig.items() if k != "symbol"}
-                    side = exit_sig["side"]
-                    exit_price = exit_sig["exit_price"]
-                    trade_id = exit_sig["trade_id"]
+                if exit_sig:
+                    exit_price = exit_sig.exit_price
+                    trade_id = exit_sig.trade_id
 
-                    pos = st["position"]
-                    info = open_trades.get((s, trade_id))
+                    st = strategy.state[s]
+                    pos = open_trades.get((s, trade_id))
 
-                    if not pos or pos["trade_id"] != trade_id or not info:
+                    if not st.has_pos or st.pos_trade_id != trade_id or pos is None:
                         continue
 
-                    qty = info["qty"]
-                    entry_price = info["entry"]
+                    side = "short" if pos.side == SHORT else "long"
+
+                    qty = pos.qty
+                    entry_price = pos.entry
 
                     if side == "short":
-                        ok, ex_price = trader.buy_market(s, qty, exit_price)
+                        ok, ex_price = trader.buy_market(s, qty, exit_price, tick_ns)
                     else:
-                        ok, ex_price = trader.sell_market(s, qty, exit_price)
+                        ok, ex_price = trader.sell_market(s, qty, exit_price, tick_ns)
 
                     actual_exit = ex_price if ok else exit_price
                     pnl_trade = trader.record_realized_trade_pnl(
-                        s, side, qty, entry_price, actual_exit
+                        s, pos.side, qty, entry_price, actual_exit
                     )
                     equity_now = trader.equity(market_prices)
 
-                    text = (
-                        "📉 <b>RT EXIT</b>\n"
-                        f"<b>Symbol:</b> {s}\n"
-                        f"<b>Trade ID:</b> #{trade_id} ({exit_sig['signal'].upper()})\n"
-                        f"<b>Side:</b> {side.upper()}\n"
-                        f"<b>Qty:</b> {qty}\n"
-                        f"<b>Entry:</b> ₹{entry_price:,.2f}\n"
-                        f"<b>Exit:</b> ₹{actual_exit:,.2f}\n"
-                        f"<b>Trade P&L:</b> ₹{pnl_trade:,.2f}\n"
-                        f"<b>Total Equity:</b> ₹{equity_now:,.2f}"
+                    text = EXIT_TPL.format_map(
+                        {
+                            "symbol": s,
+                            "trade_id": trade_id,
+                            "signal": exit_sig.kind.name,
+                            "side": side.upper(),
+                            "qty": qty,
+                            "entry": entry_price,
+                            "exit": actual_exit,
+                            "pnl": pnl_trade,
+                            "equity": equity_now,
+                        }
                     )
                     reply_id = None
-                    if info["entry_msg_ids"]:
-                        reply_id = next(iter(info["entry_msg_ids"].values()))
+                    if pos.entry_msg_ids is not None:
+                        # queued entry message; normally sent long ago
+                        entry_ids = sent_message_ids(pos.entry_msg_ids)
+                        if entry_ids:
+                            reply_id = next(iter(entry_ids.values()))
                     if notifier:
-                        notifier.send(text, reply_to_message_id=reply_id)
+                        notifier.send_async(text, reply_to_message_id=reply_id)
 
                     # flatten state
                     strategy.force_flat(s)
@@ -337,7 +382,7 @@ def main():
                             lines.append(f"{s}: ₹{price:,.1f}")
                             valid_prices += 1
                     if valid_prices > 0 and notifier:
-                        notifier.send("\n".join(lines))
+                        notifier.send_async("\n".join(lines))
                         print("LTP ping sent:", lines)
                 last_ltp_ping = now_ts
 
@@ -348,19 +393,22 @@ def main():
         print("Stopped by user. Final Equity:", equity)
         save_rt_equity_state(equity, rt_state_path)
         if notifier:
-            notifier.send(f"🛑 RT BOT STOPPED | Final Equity: ₹{equity:,.0f}")
+            notifier.send_async(f"🛑 RT BOT STOPPED | Final Equity: ₹{equity:,.0f}")
+            notifier.flush(timeout=10)
     except Exception as e:
         equity = trader.equity(market_prices)
         save_rt_equity_state(equity, rt_state_path)
         print(f"BOT ERROR: {e}")
         if notifier:
-            notifier.send(f"🚨 RT BOT CRASHED: {e}")
+            notifier.send_async(f"🚨 RT BOT CRASHED: {e}")
+            notifier.flush(timeout=10)
         raise
     else:
         equity = trader.equity(market_prices)
         save_rt_equity_state(equity, rt_state_path)
         if notifier:
-            notifier.send(f"🛑 RT BOT STOPPED | Final Equity: ₹{equity:,.0f}")
+            notifier.send_async(f"🛑 RT BOT STOPPED | Final Equity: ₹{equity:,.0f}")
+            notifier.flush(timeout=10)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,36 @@
+"""
+Ahead-of-time compile strategy_kernels.py into strategy_kernels_aot.*.so
+(numba.pycc). When the build matches strategy_kernels.KERNELS_VERSION,
+importing strategy_kernels loads it and skips numba (and JIT compilation)
+entirely.
+
+    python build_kernels_aot.py
+
+Re-run this after editing strategy_kernels.py (and bump KERNELS_VERSION
+there, so older builds are ignored); delete the .so to go back to the JIT
+kernels.
+"""
+import os
+import sys
+
+from numba.pycc import CC
+
+# build from the JIT definitions, not a previously built AOT module
+sys.modules["strategy_kernels_aot"] = None
+import strategy_kernels as K
+
+cc = CC("strategy_kernels_aot")
+cc.output_dir = os.path.dirname(os.path.abspath(__file__))
+cc.export("candle_series", K.CANDLE_SERIES_SIG)(K.candle_series.py_func)
+cc.export("run_five_ema", K.RUN_FIVE_EMA_SIG)(K.run_five_ema.py_func)
+cc.export("cross_section_step", K.CROSS_SECTION_SIG)(K.cross_section_step.py_func)
+
+
+@cc.export("kernels_version", "int64()")
+def kernels_version():
+    return K.KERNELS_VERSION
+
+
+if __name__ == "__main__":
+    cc.compile()
+    print("built", cc.output_file)
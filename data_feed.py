@@ -1,9 +1,23 @@
+import os
 import time
 import json
 
+import numpy as np
 import pyotp
 from SmartApi import SmartConnect
 
+try:
+    import orjson
+except ImportError:  # optional: faster parsing of SmartAPI responses
+    orjson = None
+
+_json_loads = orjson.loads if orjson is not None else json.loads
+
+# Session tokens are reused across bot.py / download_history.py runs until
+# they are older than SESSION_MAX_AGE (same window as _ensure_logged_in).
+TOKEN_CACHE_PATH = os.path.expanduser("~/.smartapi_token.json")
+SESSION_MAX_AGE = 6 * 60 * 60
+
 
 class SimulatedFeed:
     def __init__(self, start_price=100.0, volatility=0.5):
@@ -17,6 +31,21 @@ class SimulatedFeed:
         self.price = max(1.0, self.price + move)
         return {"symbol": symbol, "price": self.price, "time": time.time()}
 
+    def get_prices(self, symbols):
+        """
+        One tick for every symbol as a float64 array aligned with `symbols`,
+        the same walk as calling get_price() for each in turn.
+        """
+        v = self.volatility
+        steps = np.cumsum(np.random.uniform(-v, v, len(symbols)))
+        # price floored at 1.0 after every step:
+        # p[k] - 1 = max(p0 - 1 + S[k], max_j<=k (S[k] - S[j]))
+        floor = np.minimum(np.minimum.accumulate(steps), 1.0 - self.price)
+        prices = 1.0 + steps - floor
+        if prices.size:
+            self.price = float(prices[-1])
+        return prices
+
 
 class SmartAPIConnector:
     def __init__(
@@ -27,34 +56,91 @@ class SmartAPIConnector:
         totp_secret: str,
         instruments: dict,
         notifier=None,
+        token_cache=TOKEN_CACHE_PATH,
     ):
         self.api_key = api_key
         self.client_id = client_id
         self.password = password
         self.totp_secret = totp_secret
         self.instruments = instruments
+        # symbol -> (exchange, tradingsymbol, symboltoken), resolved once for get_price
+        self._inst_tuples = {
+            s: (v["exchange"], v["tradingsymbol"], v["symboltoken"])
+            for s, v in instruments.items()
+        }
         self.notifier = notifier
+        self.token_cache = token_cache
         self.smart = None
         self.last_login = 0
-        self.login()
+        if not self._restore_session():
+            self.login()
+
+    def _restore_session(self):
+        """
+        Reuse tokens saved by a previous login if they are still fresh.
+        Returns True when the session was restored (no generateSession call).
+        """
+        if not self.token_cache or not os.path.exists(self.token_cache):
+            return False
+        try:
+            saved_at = os.path.getmtime(self.token_cache)
+            if time.time() - saved_at > SESSION_MAX_AGE:
+                return False
+            with open(self.token_cache, "r") as f:
+                cached = json.load(f)
+            if cached.get("client_id") != self.client_id:
+                return False
+            tokens = cached["data"]
+            jwt = tokens["jwtToken"]
+            # generateSession returns "Bearer <jwt>", SmartConnect adds the prefix itself
+            if jwt.startswith("Bearer "):
+                jwt = jwt[len("Bearer "):]
+            smart = SmartConnect(api_key=self.api_key)
+            smart.setAccessToken(jwt)
+            smart.setRefreshToken(tokens["refreshToken"])
+            smart.setFeedToken(tokens["feedToken"])
+            smart.setUserId(self.client_id)
+        except Exception as e:
+            print("SMARTAPI token cache unusable, logging in:", e)
+            return False
+        self.smart = smart
+        self.last_login = saved_at
+        print("SMARTAPI SESSION RESTORED from", self.token_cache)
+        return True
+
+    def _save_session(self, data):
+        if not self.token_cache or not data.get("status"):
+            return
+        # tokens are credentials: write an owner-only temp file and rename it
+        # over the cache, so an existing cache with a wider mode is replaced
+        # rather than rewritten in place
+        tmp = f"{self.token_cache}.{os.getpid()}.tmp"
+        try:
+            fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, "w") as f:
+                json.dump({"client_id": self.client_id, "data": data["data"]}, f)
+            os.replace(tmp, self.token_cache)
+        except Exception as e:
+            print("Failed to save SmartAPI token cache:", e)
 
     def login(self):
         self.smart = SmartConnect(api_key=self.api_key)
         totp = pyotp.TOTP(self.totp_secret).now()
         data = self.smart.generateSession(self.client_id, self.password, totp)
         self.last_login = time.time()
+        self._save_session(data)
         if self.notifier:
-            self.notifier.send("SMARTAPI LOGIN ✅")
+            self.notifier.send_async("SMARTAPI LOGIN ✅")
         print("SMARTAPI LOGIN OK", data.get("status"))
 
     def _ensure_logged_in(self):
         # relogin every 6 hours as a simple safety
-        if time.time() - self.last_login > 6 * 60 * 60:
+        if time.time() - self.last_login > SESSION_MAX_AGE:
             self.login()
 
     def _normalize_resp(self, resp):
-        if isinstance(resp, str):
-            return json.loads(resp)
+        if isinstance(resp, (str, bytes)):
+            return _json_loads(resp)
         return resp
 
     def _handle_invalid_token_and_retry(self, func, *args, **kwargs):
@@ -63,7 +149,7 @@ class SmartAPIConnector:
         except Exception as e:
             if "AG8001" in str(e) or "Invalid Token" in str(e):
                 if self.notifier:
-                    self.notifier.send("SMARTAPI: Invalid Token AG8001, re-logging in…")
+                    self.notifier.send_async("SMARTAPI: Invalid Token AG8001, re-logging in…")
                 self.login()
                 resp = func(*args, **kwargs)
             else:
@@ -74,7 +160,7 @@ class SmartAPIConnector:
             code = resp.get("errorCode", "")
             if "AG8001" in code or "Invalid Token" in msg:
                 if self.notifier:
-                    self.notifier.send(
+                    self.notifier.send_async(
                         "SMARTAPI: Invalid Token AG8001 (resp), re-logging in…"
                     )
                 self.login()
@@ -86,12 +172,10 @@ class SmartAPIConnector:
 
     def get_price(self, symbol: str):
         self._ensure_logged_in()
-        inst = self.instruments.get(symbol)
+        inst = self._inst_tuples.get(symbol)
         if inst is None:
             raise ValueError(f"No SmartAPI instrument config for symbol {symbol}")
-        exchange = inst["exchange"]
-        tradingsymbol = inst["tradingsymbol"]
-        symboltoken = inst["symboltoken"]
+        exchange, tradingsymbol, symboltoken = inst
 
         def _ltp():
             return self.smart.ltpData(exchange, tradingsymbol, symboltoken)
@@ -96,11 +96,13 @@ def main():
             with open(out_path, "w", newline="") as f:
                 w = csv.writer(f)
                 w.writerow(["datetime", "open", "high", "low", "close", "volume"])
-                for r in rows:
-                    w.writerow(r)
+                w.writerows(rows)
 
             print(f"[{symbol}] Saved {len(rows)} candles to {out_path}")
 
+    if notifier:
+        notifier.flush(timeout=10)
+
 
 if __name__ == "__main__":
     main()
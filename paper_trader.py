@@ -1,26 +1,150 @@
+from collections import namedtuple
+from typing import Callable, Union
+
+import numpy as np
+
+# trade log side codes (stored as uint8)
+SIDE_BUY = 0
+SIDE_SELL = 1
+_SIDE_NAMES = ("BUY", "SELL")
+
+# one row of PaperTrader.trade_log
+TradeRecord = namedtuple("TradeRecord", "time_ns side symbol qty price")
+
+# symbol -> price (None when unknown), or an array aligned with symbol_index
+MarketPrices = Union[dict[str, Union[float, None]], np.ndarray]
+
+
 class PaperTrader:
-    def __init__(self, starting_cash: float = 100000.0, slippage: float = 0.0):
+    # fully annotated so the module can be compiled with mypyc (see README)
+    starting_cash: float
+    cash: float
+    slippage: float
+    _apply_slippage: Callable[[float, str], float]
+    symbol_index: dict[str, int]
+    _syms: list[str]
+    qty: np.ndarray
+    avg: np.ndarray
+    realized: np.ndarray
+    _log_cap: int
+    _log_ts: np.ndarray
+    _log_px: np.ndarray
+    _log_qty: np.ndarray
+    _log_side: np.ndarray
+    _log_sym: np.ndarray
+    _log_head: int
+    _log_count: int
+
+    def __init__(
+        self,
+        starting_cash: float = 100000.0,
+        slippage: float = 0.0,
+        log_capacity: int = 1_000_000,
+        max_symbols: int = 64,
+    ) -> None:
         self.starting_cash = starting_cash
         self.cash = starting_cash
         self.slippage = slippage
-        # positions: symbol -> qty (long > 0, short < 0)
-        self.positions: dict[str, int] = {}
-        # avg_price: symbol -> avg entry price of current open position
-        self.avg_price: dict[str, float] = {}
-        # realized P&L per symbol (only closed trades)
-        self.realized_pnl: dict[str, float] = {}
-        # trade log if you need it
-        self.trade_log: list[dict] = []
-
-    def _apply_slippage(self, price: float, side: str) -> float:
-        if self.slippage <= 0:
-            return price
-        if side == "buy":
-            return price * (1 + self.slippage)
+        # _apply_slippage(price, side) is bound once here instead of re-checking
+        # the slippage setting on every trade
+        if slippage <= 0:
+            self._apply_slippage = lambda price, side: price
+        else:
+            buy_mult = 1 + slippage
+            sell_mult = 1 - slippage
+            self._apply_slippage = lambda price, side: (
+                price * buy_mult if side == "buy" else price * sell_mult
+            )
+        # positions as struct-of-arrays: symbol_index[symbol] = i, then
+        # qty[i] (long > 0, short < 0), avg[i] (avg entry price, 0 when flat)
+        # and realized[i] (P&L of closed trades). Arrays grow (doubling) past
+        # max_symbols. One symbol_index lookup serves all of them.
+        self.symbol_index: dict[str, int] = {}
+        self._syms: list[str] = []
+        self.qty = np.zeros(max_symbols, dtype=np.float64)
+        self.avg = np.zeros(max_symbols, dtype=np.float64)
+        self.realized = np.zeros(max_symbols, dtype=np.float64)
+        # trade log as a fixed-size ring buffer of columns (see trade_log);
+        # once full, the oldest trades are overwritten
+        self._log_cap = log_capacity
+        self._log_ts = np.empty(log_capacity, dtype="i8")  # epoch nanoseconds
+        self._log_px = np.empty(log_capacity, dtype="f8")
+        self._log_qty = np.empty(log_capacity, dtype="i4")
+        self._log_side = np.empty(log_capacity, dtype="u1")
+        self._log_sym = np.empty(log_capacity, dtype="i4")  # symbol_index ids
+        self._log_head = 0  # next slot to write
+        self._log_count = 0  # trades recorded in total, including overwritten ones
+
+    def _slot(self, symbol: str) -> int:
+        i = self.symbol_index.get(symbol)
+        if i is None:
+            i = self.symbol_index[symbol] = len(self._syms)
+            self._syms.append(symbol)
+            if i == self.qty.shape[0]:
+                self.qty = np.concatenate([self.qty, np.zeros_like(self.qty)])
+                self.avg = np.concatenate([self.avg, np.zeros_like(self.avg)])
+                self.realized = np.concatenate([self.realized, np.zeros_like(self.realized)])
+        return i
+
+    def position(self, symbol: str) -> tuple[float, float]:
+        """(qty, avg entry price) for symbol; (0.0, 0.0) when flat or unknown."""
+        i = self.symbol_index.get(symbol)
+        if i is None:
+            return 0.0, 0.0
+        return float(self.qty[i]), float(self.avg[i])
+
+    def _record_trade(
+        self, side: int, sid: int, qty: int, price: float, tstamp_ns: int
+    ) -> None:
+        i = self._log_head
+        self._log_ts[i] = tstamp_ns
+        self._log_px[i] = price
+        self._log_qty[i] = qty
+        self._log_side[i] = side
+        self._log_sym[i] = sid
+        i += 1
+        self._log_head = 0 if i == self._log_cap else i
+        self._log_count += 1
+
+    def trade_columns(self) -> dict[str, np.ndarray]:
+        """
+        Recorded trades as NumPy columns, oldest first: time_ns, side
+        (SIDE_BUY/SIDE_SELL), sid (symbol_index id), qty, price.
+        Use this rather than trade_log for analytics over the whole log.
+        """
+        n = min(self._log_count, self._log_cap)
+        idx: Union[slice, np.ndarray]
+        if self._log_count > self._log_cap:
+            idx = (self._log_head + np.arange(n)) % self._log_cap
         else:
-            return price * (1 - self.slippage)
+            idx = slice(0, n)
+        return {
+            "time_ns": self._log_ts[idx].copy(),
+            "side": self._log_side[idx].copy(),
+            "sid": self._log_sym[idx].copy(),
+            "qty": self._log_qty[idx].copy(),
+            "price": self._log_px[idx].copy(),
+        }
 
-    def buy_market(self, symbol: str, qty: int, price: float):
+    @property
+    def trade_log(self) -> list[TradeRecord]:
+        """Recorded trades, oldest first (at most log_capacity of them)."""
+        cols = self.trade_columns()
+        names = self._syms
+        return [
+            TradeRecord(ts_ns, _SIDE_NAMES[side], names[sid], qty, px)
+            for ts_ns, side, sid, qty, px in zip(
+                cols["time_ns"].tolist(),
+                cols["side"].tolist(),
+                cols["sid"].tolist(),
+                cols["qty"].tolist(),
+                cols["price"].tolist(),
+            )
+        ]
+
+    def buy_market(
+        self, symbol: str, qty: int, price: float, tstamp_ns: int
+    ) -> tuple[bool, float]:
         qty = int(qty)
         if qty <= 0:
             return False, price
@@ -29,98 +153,111 @@ class PaperTrader:
         if self.cash < cost:
             return False, trade_price
 
-        prev_qty = self.positions.get(symbol, 0)
-        prev_avg = self.avg_price.get(symbol, trade_price)
+        i = self._slot(symbol)
+        qtys = self.qty
+        avgs = self.avg
+        prev_qty = qtys[i]
 
         # if existing short, this may close/flip
         if prev_qty >= 0:
             new_qty = prev_qty + qty
-            new_avg = (
-                (prev_qty * prev_avg + qty * trade_price) / new_qty
-                if new_qty != 0
-                else trade_price
-            )
-            self.positions[symbol] = new_qty
-            self.avg_price[symbol] = new_avg
+            avgs[i] = (prev_qty * avgs[i] + qty * trade_price) / new_qty
+            qtys[i] = new_qty
         else:
             # closing or flipping short
-            if qty <= abs(prev_qty):
-                self.positions[symbol] = prev_qty + qty
-                if self.positions[symbol] == 0:
-                    self.avg_price.pop(symbol, None)
-            else:
-                remaining = qty + prev_qty
-                self.positions[symbol] = remaining
-                self.avg_price[symbol] = trade_price
+            new_qty = prev_qty + qty
+            qtys[i] = new_qty
+            if new_qty == 0:
+                avgs[i] = 0.0
+            elif new_qty > 0:
+                avgs[i] = trade_price
 
         self.cash -= cost
-        self.trade_log.append(
-            {"symbol": symbol, "side": "BUY", "qty": qty, "price": trade_price}
-        )
+        self._record_trade(SIDE_BUY, i, qty, trade_price, tstamp_ns)
         return True, trade_price
 
-    def sell_market(self, symbol: str, qty: int, price: float):
+    def sell_market(
+        self, symbol: str, qty: int, price: float, tstamp_ns: int
+    ) -> tuple[bool, float]:
         qty = int(abs(qty))
         if qty <= 0:
             return False, price
         trade_price = self._apply_slippage(price, "sell")
         revenue = qty * trade_price
 
-        prev_qty = self.positions.get(symbol, 0)
-        prev_avg = self.avg_price.get(symbol, trade_price)
+        i = self._slot(symbol)
+        qtys = self.qty
+        avgs = self.avg
+        prev_qty = qtys[i]
 
         if prev_qty <= 0:
             new_qty = prev_qty - qty
-            new_avg = (
-                (abs(prev_qty) * prev_avg + qty * trade_price) / abs(new_qty)
-                if new_qty != 0
-                else trade_price
-            )
-            self.positions[symbol] = new_qty
-            self.avg_price[symbol] = new_avg
+            avgs[i] = (-prev_qty * avgs[i] + qty * trade_price) / -new_qty
+            qtys[i] = new_qty
         else:
-            if qty <= prev_qty:
-                self.positions[symbol] = prev_qty - qty
-                if self.positions[symbol] == 0:
-                    self.avg_price.pop(symbol, None)
-            else:
-                remaining = prev_qty - qty
-                self.positions[symbol] = remaining
-                self.avg_price[symbol] = trade_price
+            # closing or flipping long
+            new_qty = prev_qty - qty
+            qtys[i] = new_qty
+            if new_qty == 0:
+                avgs[i] = 0.0
+            elif new_qty < 0:
+                avgs[i] = trade_price
 
         self.cash += revenue
-        self.trade_log.append(
-            {"symbol": symbol, "side": "SELL", "qty": qty, "price": trade_price}
-        )
+        self._record_trade(SIDE_SELL, i, qty, trade_price, tstamp_ns)
         return True, trade_price
 
     def record_realized_trade_pnl(
         self,
         symbol: str,
-        side: str,  # 'long' or 'short'
+        side: float,  # +1 long, -1 short (strategy.LONG / strategy.SHORT)
         qty: int,
         entry_price: float,
         exit_price: float,
     ) -> float:
-        if side == "long":
-            pnl = (exit_price - entry_price) * qty
-        else:
-            pnl = (entry_price - exit_price) * qty
-        self.realized_pnl[symbol] = self.realized_pnl.get(symbol, 0.0) + pnl
+        pnl = side * (exit_price - entry_price) * qty
+        i = self._slot(symbol)  # may grow the arrays, so look up first
+        self.realized[i] += pnl
         return pnl
 
-    def mark_to_market(self, market_prices: dict[str, float]) -> float:
-        total = self.cash
-        for symbol, qty in self.positions.items():
-            price = market_prices.get(symbol)
-            if price is None or qty == 0:
-                continue
-            avg = self.avg_price.get(symbol, price)
-            if qty > 0:
-                total += (price - avg) * qty
-            else:
-                total += (avg - price) * abs(qty)
-        return total
-
-    def equity(self, market_prices: dict[str, float]) -> float:
+    @property
+    def realized_pnl(self) -> dict[str, float]:
+        """Realized P&L per symbol (only closed trades)."""
+        return dict(zip(self._syms, self.realized[: len(self._syms)].tolist()))
+
+    def _unrealized(self, market_prices: MarketPrices) -> float:
+        n = len(self._syms)
+        if n == 0:
+            return 0.0
+        if isinstance(market_prices, np.ndarray):
+            # already aligned with symbol_index
+            market = np.array(market_prices[:n], dtype=np.float64)
+        else:
+            nan = float("nan")
+            market = np.fromiter(
+                (
+                    nan if (p := market_prices.get(s)) is None else p
+                    for s in self._syms
+                ),
+                dtype=np.float64,
+                count=n,
+            )
+        avg = self.avg[:n]
+        # a missing (NaN) price counts as no move from the entry price.
+        # (price - avg) . qty covers shorts too (qty < 0).
+        np.copyto(market, avg, where=np.isnan(market))
+        return float(np.dot(self.qty[:n], market - avg))
+
+    def pnl(self, market_prices: MarketPrices) -> dict[str, float]:
+        """
+        Cash, unrealized P&L and their total at `market_prices`: a dict of
+        symbol -> price, or an array aligned with symbol_index.
+        """
+        unrealized = self._unrealized(market_prices)
+        return {"cash": self.cash, "unrealized": unrealized, "total": self.cash + unrealized}
+
+    def mark_to_market(self, market_prices: MarketPrices) -> float:
+        return self.cash + self._unrealized(market_prices)
+
+    def equity(self, market_prices: MarketPrices) -> float:
         return self.mark_to_market(market_prices)
@@ -0,0 +1,20 @@
+from concurrent.futures import Future
+from dataclasses import dataclass
+from typing import Optional
+
+
+@dataclass(slots=True)
+class Position:
+    """
+    An executed open trade as tracked by backtest.py / bot.py (qty and the
+    fill price are theirs, not the strategy's).
+    """
+
+    side: int  # strategy.LONG / SHORT, also the sign of the trade's P&L
+    qty: int
+    entry: float  # fill price
+    sl: float
+    tp: float
+    trade_id: int
+    # TelegramNotifier.send() Future of the entry message ids, or None
+    entry_msg_ids: Optional[Future] = None
@@ -1,24 +1,111 @@
+import os
+import pickle
+import sys
 import time
 import yaml
+import numpy as np
 
-from strategy import FiveEMA
+from strategy import FiveEMACrossSection, Signal, SignalKind
 from paper_trader import PaperTrader
 from data_feed import SimulatedFeed
 from telegram_notifier import TelegramNotifier
 
 
+# libyaml-backed loader when PyYAML was built with it
+_YAML_LOADER = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+
+
 def load_config(path="config.yaml"):
+    """
+    Parse `path`, caching the result next to it as `<path>.pkl`.
+    The cache is reused while the YAML file's (mtime_ns, size) match the
+    ones it was built from.
+    """
+    cache = path + ".pkl"
+    st = os.stat(path)
+    key = (st.st_mtime_ns, st.st_size)
+    try:
+        with open(cache, "rb") as f:
+            cached_key, cfg = pickle.load(f)
+        if cached_key == key:
+            return cfg
+    except (OSError, pickle.UnpicklingError, EOFError, TypeError, ValueError):
+        pass
+
     with open(path, "r") as f:
-        return yaml.safe_load(f)
+        cfg = yaml.load(f, Loader=_YAML_LOADER)
+
+    # write to a temp file and rename so a concurrent run never sees half a pickle;
+    # the config holds credentials, so the file is owner-only like the token cache
+    tmp = f"{cache}.{os.getpid()}.tmp"
+    try:
+        fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            pickle.dump((key, cfg), f, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(tmp, cache)
+    except OSError:
+        pass
+    return cfg
+
+
+TICK_SECONDS = 0.2  # pause between polling passes
+LOG_FLUSH_BARS = 100  # write buffered output every this many bar closes
+
+
+class CandleAggregator:
+    """
+    Collects tick prices for a fixed list of symbols in one preallocated
+    (n_symbols, cap) buffer. All symbols tick together, so one clock closes
+    every symbol's bar once `bar_seconds` have passed since its first tick.
+    """
+
+    __slots__ = ("buf", "n", "start", "cap", "bar_seconds")
+
+    def __init__(self, n_symbols, bar_seconds, cap):
+        self.cap = max(int(cap), 5)
+        self.buf = np.empty((n_symbols, self.cap), dtype=np.float64)
+        self.n = 0
+        self.start = 0.0
+        self.bar_seconds = bar_seconds
+
+    def push(self, prices, ts):
+        """
+        Add one tick per symbol (array aligned with the symbol list); returns
+        the completed (o, h, l, c) arrays when `ts` closes the bar.
+        """
+        n = self.n
+        buf = self.buf
+        if n and ts - self.start >= self.bar_seconds:
+            bar = buf[:, :n]
+            completed = (bar[:, 0].copy(), bar.max(axis=1), bar.min(axis=1), bar[:, n - 1].copy())
+            buf[:, 0] = prices
+            self.n = 1
+            self.start = ts
+            return completed
+        if n == 0:
+            self.start = ts
+        elif n == self.cap:
+            # more ticks than expected: fold the bar down to o, h, l, c
+            bar = buf[:, :n]
+            hi, lo, last = bar.max(axis=1), bar.min(axis=1), bar[:, n - 1].copy()
+            buf[:, 1] = hi
+            buf[:, 2] = lo
+            buf[:, 3] = last
+            n = 4
+        buf[:, n] = prices
+        self.n = n + 1
+        return None
 
 
-def smoke_run(iterations=200, bar_seconds=5):
+def smoke_run(iterations=200, bar_seconds=5, realtime=False):
     """
     Quick local smoke test using SimulatedFeed and 5-EMA long+short strategy.
 
     - Uses short 'bar_seconds' so you don't wait real 5/15 minutes.
     - Builds mini 5s-candles and feeds them as 5m + 15m equivalents.
     - Sends TEST messages to all Telegram chat_ids if enabled.
+    - realtime=False skips the TICK_SECONDS pause and stamps ticks on a
+      simulated clock instead, so the run finishes as fast as it computes.
     """
 
     cfg = load_config("config.yaml")
@@ -37,126 +124,135 @@ def smoke_run(iterations=200, bar_seconds=5):
     symbols = ["NIFTY_TEST", "BANKNIFTY_TEST"]
     feed = SimulatedFeed(start_price=100.0, volatility=0.5)
     trader = PaperTrader(starting_cash=100000, slippage=0.0)
-    strategies = {s: FiveEMA(ema_period=5, rr=3.0, max_trades_per_day=5) for s in symbols}
-    market_prices = {s: None for s in symbols}
+    # one strategy for all symbols: each bar close is one update_cross_section() call
+    strategy = FiveEMACrossSection(symbols, ema_period=5, rr=3.0, max_trades_per_day=5)
+    prices = np.full(len(symbols), np.nan)
 
-    # simple per-symbol candle builders for test
-    current_5s = {s: None for s in symbols}
+    # pseudo-candles of length `bar_seconds` for all symbols at once
+    # (used as both 5m and 15m candles in this smoke test)
+    cap = int(bar_seconds / TICK_SECONDS) + 1
+    aggregator = CandleAggregator(len(symbols), bar_seconds, cap)
 
-    def update_candle(symbol, price, ts):
-        """
-        Build pseudo-candles of length `bar_seconds` for each symbol
-        (used as both 5m and 15m candles in this smoke test).
-        """
-        cndl = current_5s[symbol]
-        if cndl is None:
-            current_5s[symbol] = {
-                "start": ts,
-                "o": price,
-                "h": price,
-                "l": price,
-                "c": price,
-            }
-            return None
-
-        if ts - cndl["start"] < bar_seconds:
-            cndl["h"] = max(cndl["h"], price)
-            cndl["l"] = min(cndl["l"], price)
-            cndl["c"] = price
-            return None
-        else:
-            completed = (cndl["o"], cndl["h"], cndl["l"], cndl["c"])
-            current_5s[symbol] = {
-                "start": ts,
-                "o": price,
-                "h": price,
-                "l": price,
-                "c": price,
-            }
-            return completed
+    # output is collected here and written in one go every LOG_FLUSH_BARS bars
+    # instead of one print() (and stdout write) per line
+    t0 = time.time()
+    log_buf = bytearray()
+    out = sys.stdout.buffer
+    bars = 0
+
+    def write_log():
+        # print() output still buffered in sys.stdout (e.g. from the notifier)
+        # goes out first, so the two never interleave mid-line
+        sys.stdout.flush()
+        out.write(log_buf)
+        out.flush()
+        del log_buf[:]
 
     for i in range(iterations):
-        for s in symbols:
-            tick = feed.get_price(s)
-            price = tick["price"]
-            ts = tick["time"]
-            market_prices[s] = price
-
-            cndl = update_candle(s, price, ts)
-            if cndl is None:
-                continue
+        if realtime and i:
+            time.sleep(TICK_SECONDS)
+        # without the pause wall-clock time would never close a bar, so
+        # advance a simulated clock instead
+        ts = time.time() if realtime else t0 + i * TICK_SECONDS
+
+        # one tick for every symbol; only bar closes reach per-symbol code
+        prices = feed.get_prices(symbols)
+        cndl = aggregator.push(prices, ts)
+        if cndl is None:
+            continue
+
+        bars += 1
+        if bars % LOG_FLUSH_BARS == 0:
+            write_log()
+        ts_ns = int(ts * 1_000_000_000)
 
-            o, h, l, c = cndl
+        # feed once as "5m" candle, then again as "15m" to exercise long logic;
+        # only symbols that entered come back, keyed by their index
+        sigs_5m = dict(strategy.update_cross_section(*cndl, ts, tf_minutes=5))
+        sigs_15m = dict(strategy.update_cross_section(*cndl, ts, tf_minutes=15))
+        # SL/TP of positions still open from earlier bars, against this close
+        exits = strategy.exit_signal_vec(cndl[3])
 
-            # feed once as "5m" candle
-            sig = strategies[s].update_candle(o, h, l, c, ts, tf_minutes=5)
-            print(f"[{s}] bar_close 5m price={c:.2f} signal={sig}")
+        for k, (s, c) in enumerate(zip(symbols, cndl[3].tolist())):
+            sig = sigs_5m.get(k)
+            log_buf += f"[{s}] bar_close 5m price={c:.2f} signal={sig}\n".encode()
 
-            # feed again as "15m" candle to exercise long logic
-            sig2 = strategies[s].update_candle(o, h, l, c, ts, tf_minutes=15)
+            sig2 = sigs_15m.get(k)
             if sig2 is not None:
                 sig = sig2
-                print(f"[{s}] bar_close 15m price={c:.2f} signal={sig}")
+                log_buf += f"[{s}] bar_close 15m price={c:.2f} signal={sig}\n".encode()
+
+            if sig is None and exits[k]:
+                st = strategy.state[s]
+                exit_kind = SignalKind(exits[k])
+                exit_price = st.pos_sl if exit_kind == SignalKind.EXIT_SL else st.pos_tp
+                sig = Signal(
+                    exit_kind, st.pos_entry, st.pos_sl, st.pos_tp, exit_price, st.pos_trade_id
+                )
+                strategy.force_flat(s)
+                log_buf += f"[{s}] exit price={c:.2f} signal={sig}\n".encode()
 
             if sig is None:
                 continue
 
-            if sig["signal"] == "short_entry":
-                ok, res = trader.sell_market(s, 1, sig["entry"])
+            kind = sig.kind
+            if kind == SignalKind.SHORT_ENTRY:
+                ok, res = trader.sell_market(s, 1, sig.entry, ts_ns)
                 msg = (
                     f"TEST: SHORT entry\n"
                     f"Symbol: {s}\n"
                     f"Qty: 1\n"
-                    f"Entry: {sig['entry']:.2f}\n"
-                    f"SL: {sig['sl']:.2f}\n"
-                    f"TP: {sig['tp']:.2f}"
+                    f"Entry: {sig.entry:.2f}\n"
+                    f"SL: {sig.sl:.2f}\n"
+                    f"TP: {sig.tp:.2f}"
                 )
-                print("  SHORT executed:", ok, res)
+                log_buf += f"  SHORT executed: {ok} {res}\n".encode()
                 if notifier and ok:
-                    notifier.send(msg)
+                    notifier.send_async(msg)
 
-            elif sig["signal"] == "long_entry":
-                ok, res = trader.buy_market(s, 1, sig["entry"])
+            elif kind == SignalKind.LONG_ENTRY:
+                ok, res = trader.buy_market(s, 1, sig.entry, ts_ns)
                 msg = (
                     f"TEST: LONG entry\n"
                     f"Symbol: {s}\n"
                     f"Qty: 1\n"
-                    f"Entry: {sig['entry']:.2f}\n"
-                    f"SL: {sig['sl']:.2f}\n"
-                    f"TP: {sig['tp']:.2f}"
+                    f"Entry: {sig.entry:.2f}\n"
+                    f"SL: {sig.sl:.2f}\n"
+                    f"TP: {sig.tp:.2f}"
                 )
-                print("  LONG executed:", ok, res)
+                log_buf += f"  LONG executed: {ok} {res}\n".encode()
                 if notifier and ok:
-                    notifier.send(msg)
+                    notifier.send_async(msg)
 
-            elif sig["signal"] in ("exit_sl", "exit_tp"):
-                pos_qty = trader.positions.get(s, 0)
-                side = "long" if pos_qty > 0 else "short"
+            elif kind in (SignalKind.EXIT_SL, SignalKind.EXIT_TP):
+                pos_qty, pos_avg = trader.position(s)
+                side = 1.0 if pos_qty > 0 else -1.0
 
-                if side == "short":
-                    ok, res = trader.buy_market(s, 1, sig["exit_price"])
+                if side < 0:
+                    ok, res = trader.buy_market(s, 1, sig.exit_price, ts_ns)
                 else:
-                    ok, res = trader.sell_market(s, 1, sig["exit_price"])
+                    ok, res = trader.sell_market(s, 1, sig.exit_price, ts_ns)
 
-                avg_entry = trader.avg_price.get(s, sig["exit_price"])
-                from_side = "long" if side == "long" else "short"
-                pnl_trade = trader.realized_trade_pnl(
-                    from_side, s, 1, avg_entry, res if ok else sig["exit_price"]
+                avg_entry = pos_avg if pos_qty else sig.exit_price
+                pnl_trade = trader.record_realized_trade_pnl(
+                    s, side, 1, avg_entry, res if ok else sig.exit_price
                 )
 
                 msg = (
-                    f"TEST: EXIT {sig['signal']}\n"
+                    f"TEST: EXIT {kind.name}\n"
                     f"Symbol: {s}\n"
                     f"Qty: 1\n"
-                    f"Price: {sig['exit_price']:.2f}\n"
+                    f"Price: {sig.exit_price:.2f}\n"
                     f"P&L: {pnl_trade:.2f}"
                 )
-                print("  EXIT executed:", ok, res)
+                log_buf += f"  EXIT executed: {ok} {res}\n".encode()
                 if notifier and ok:
-                    notifier.send(msg)
-
-        time.sleep(0.2)
+                    notifier.send_async(msg)
 
+    write_log()
+    if notifier:
+        notifier.flush(timeout=10)
+    market_prices = dict(zip(symbols, prices.tolist()))
     print("\nFinal PnL:", trader.pnl(market_prices))
     print("Trade log:")
     for t in trader.trade_log:
@@ -164,4 +260,4 @@ def smoke_run(iterations=200, bar_seconds=5):
 
 
 if __name__ == "__main__":
-    smoke_run(200, bar_seconds=5)
+    smoke_run(200, bar_seconds=5, realtime=False)
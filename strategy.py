@@ -1,5 +1,235 @@
 import time
-from collections import defaultdict
+from enum import IntEnum
+from typing import NamedTuple
+
+import numpy as np
+
+from strategy_kernels import (
+    SIG_EXIT_SL,
+    SIG_EXIT_TP,
+    SIG_LONG_ENTRY,
+    SIG_NONE,
+    SIG_SHORT_ENTRY,
+    candle_series,
+    cross_section_step,
+    run_five_ema,
+)
+
+# position side codes
+LONG = 1
+SHORT = -1
+
+
+class SignalKind(IntEnum):
+    NONE = SIG_NONE
+    SHORT_ENTRY = SIG_SHORT_ENTRY
+    LONG_ENTRY = SIG_LONG_ENTRY
+    EXIT_SL = SIG_EXIT_SL
+    EXIT_TP = SIG_EXIT_TP
+
+
+class Signal(NamedTuple):
+    """Entry or exit event; exit_price is NaN for entries."""
+
+    kind: SignalKind
+    entry: float
+    sl: float
+    tp: float
+    exit_price: float
+    trade_id: int
+
+
+def exit_scan(prices, sl, tp, side):
+    """
+    First SL/TP hit in a price path for one position (side LONG/SHORT), as
+    exit_signal() would find it price by price.
+
+    Returns (index, SIG_EXIT_SL / SIG_EXIT_TP), or (-1, SIG_NONE) if neither
+    is reached; SL wins when one price crosses both.
+    """
+    signed = side * np.asarray(prices, dtype=np.float64)
+    hit_sl = signed <= side * sl
+    hit = hit_sl | (signed >= side * tp)
+    if not hit.any():
+        return -1, SIG_NONE
+    i = int(hit.argmax())
+    return i, SIG_EXIT_SL if hit_sl[i] else SIG_EXIT_TP
+
+
+# per-symbol state fields: (name, dtype, initial). FiveEMA keeps them as plain
+# attributes of one SymbolState per symbol; FiveEMACrossSection as one NumPy
+# column per field. "not set yet" is NaN (EMAs) or -1 (current_day).
+STATE_FIELDS = (
+    # EMAs are seeded with the mean of their first ema_period closes; until
+    # then they stay NaN and *_n / *_sum count and sum the closes seen
+    ("ema_short", np.float64, np.nan),
+    ("ema_short_n", np.int32, 0),
+    ("ema_short_sum", np.float64, 0.0),
+    ("ema_long", np.float64, np.nan),
+    ("ema_long_n", np.int32, 0),
+    ("ema_long_sum", np.float64, 0.0),
+    # pending signal candle, 5m short side / 15m long side
+    ("has_sig_s", np.bool_, False),
+    ("sig_s_hi", np.float64, 0.0),
+    ("sig_s_lo", np.float64, 0.0),
+    ("has_sig_l", np.bool_, False),
+    ("sig_l_hi", np.float64, 0.0),
+    ("sig_l_lo", np.float64, 0.0),
+    # strategy owns position; backtest/bot reads it and calls force_flat on exit
+    ("has_pos", np.bool_, False),
+    ("pos_side", np.int8, 0),  # LONG / SHORT
+    ("pos_entry", np.float64, 0.0),
+    ("pos_sl", np.float64, 0.0),
+    ("pos_tp", np.float64, 0.0),
+    # pos_side * pos_sl / pos_side * pos_tp: with price signed the same way,
+    # SL is hit when side*price <= stop bound, TP when >= take bound
+    ("pos_stop_bound", np.float64, 0.0),
+    ("pos_take_bound", np.float64, 0.0),
+    ("pos_trade_id", np.int64, 0),
+    ("trades_today", np.int32, 0),
+    ("current_day", np.int64, -1),  # local-day bucket, see FiveEMA._step_5m
+    ("next_trade_id", np.int64, 1),
+)
+
+# plain Python value of each field's initial state
+_PY_TYPES = {np.float64: float, np.bool_: bool}
+_STATE_INIT = tuple(
+    (name, _PY_TYPES.get(dtype, int)(init)) for name, dtype, init in STATE_FIELDS
+)
+
+
+# columns of FiveEMA's entry log (see entry_columns()): (name, dtype)
+ENTRY_LOG_FIELDS = (
+    ("ts", np.float64),  # candle ts passed to the update
+    ("sid", np.int32),  # FiveEMA.symbol_ids() id, or FiveEMACrossSection.symbols index
+    ("kind", np.uint8),  # SIG_SHORT_ENTRY / SIG_LONG_ENTRY
+    ("entry", np.float64),
+    ("sl", np.float64),
+    ("tp", np.float64),
+    ("trade_id", np.int64),
+)
+
+
+class _EntryLog:
+    """
+    Entry signals as a ring buffer of ENTRY_LOG_FIELDS columns; once full,
+    the oldest entries are overwritten.
+    """
+
+    __slots__ = ("cols", "cap", "head", "count")
+
+    def __init__(self, capacity):
+        self.cols = {name: np.empty(capacity, dtype=dtype) for name, dtype in ENTRY_LOG_FIELDS}
+        self.cap = capacity
+        self.head = 0  # next slot to write
+        self.count = 0  # entries logged in total, including overwritten ones
+
+    def append(self, ts, sid, kind, entry, sl, tp, trade_id):
+        cols = self.cols
+        k = self.head
+        cols["ts"][k] = ts
+        cols["sid"][k] = sid
+        cols["kind"][k] = kind
+        cols["entry"][k] = entry
+        cols["sl"][k] = sl
+        cols["tp"][k] = tp
+        cols["trade_id"][k] = trade_id
+        k += 1
+        self.head = 0 if k == self.cap else k
+        self.count += 1
+
+    def extend(self, ts, sids, kinds, entry, sl, tp, trade_id):
+        # append() for a batch of entries (arrays); ts may be one scalar
+        n = len(sids)
+        idx = (self.head + np.arange(n)) % self.cap
+        for (name, _), values in zip(ENTRY_LOG_FIELDS, (ts, sids, kinds, entry, sl, tp, trade_id)):
+            self.cols[name][idx] = values
+        self.head = (self.head + n) % self.cap
+        self.count += n
+
+    def columns(self):
+        n = min(self.count, self.cap)
+        if self.count > self.cap:
+            idx = (self.head + np.arange(n)) % self.cap
+        else:
+            idx = slice(0, n)
+        return {name: col[idx].copy() for name, col in self.cols.items()}
+
+    def last(self):
+        if self.count == 0:
+            return None
+        k = (self.head - 1) % self.cap
+        row = {name: col[k].item() for name, col in self.cols.items()}
+        row["kind"] = SignalKind(row["kind"])
+        return row
+
+
+def _local_utc_offset():
+    # the offset in effect now (time.localtime(0) would give the one at the
+    # epoch, off by an hour under DST). A DST change later only moves the day
+    # boundary by that hour around midnight, away from market hours.
+    return time.localtime().tm_gmtoff
+
+
+def _exit_kinds(has_pos, side, stop_bound, take_bound, prices):
+    # exit_signal() as masks over aligned arrays; SL wins if both are crossed
+    signed_price = side * np.asarray(prices, dtype=np.float64)
+    hit_sl = has_pos & (signed_price <= stop_bound)
+    hit_tp = has_pos & (signed_price >= take_bound)
+    kind = np.where(hit_tp, SIG_EXIT_TP, SIG_NONE).astype(np.int8)
+    kind[hit_sl] = SIG_EXIT_SL
+    return kind
+
+
+class SymbolState:
+    """Per-symbol strategy state as plain scalar slots (STATE_FIELDS)."""
+
+    __slots__ = ("symbol", "sid") + tuple(name for name, _, _ in STATE_FIELDS)
+
+    def __init__(self, symbol, sid):
+        self.symbol = symbol
+        self.sid = sid
+        for name, init in _STATE_INIT:
+            setattr(self, name, init)
+
+
+class _SymbolStates(dict):
+    """
+    symbol -> SymbolState; unknown symbols get a fresh state, and
+    on_new(sid) is called for each.
+    """
+
+    def __init__(self, rows, on_new):
+        super().__init__()
+        self._rows = rows  # the same states by sid
+        self._on_new = on_new
+
+    def __missing__(self, symbol):
+        st = self[symbol] = SymbolState(symbol, len(self._rows))
+        self._rows.append(st)
+        self._on_new(st.sid)
+        return st
+
+
+class SymbolStream:
+    """
+    One symbol's candle feed into a FiveEMA, from FiveEMA.bind(symbol).
+    update_5m() / update_15m() take (o, h, l, c, ts) and return what
+    update_candle() would; st is the symbol's SymbolState.
+    """
+
+    __slots__ = ("symbol", "st", "_owner")
+
+    def __init__(self, owner, symbol):
+        self.symbol = symbol
+        self.st = owner.state[symbol]
+        self._owner = owner
+
+    def update_5m(self, o, h, l, c, ts):
+        return self._owner._step_5m(self.st, o, h, l, c, ts)
+
+    def update_15m(self, o, h, l, c, ts):
+        return self._owner._step_15m(self.st, o, h, l, c, ts)
 
 
 class FiveEMA:
@@ -11,236 +241,562 @@ class FiveEMA:
     - Exit via SL/TP checked externally using exit_signal().
     """
 
-    def __init__(self, ema_period=5, rr=3.0, max_trades_per_day=5):
+    __slots__ = (
+        "ema_period",
+        "alpha",
+        "one_minus_alpha",
+        "rr",
+        "max_trades_per_day",
+        "state",
+        "_rows",
+        "_tz_offset",
+        "_pos_open",
+        "_pos_side",
+        "_pos_stop",
+        "_pos_take",
+        "_entries",
+    )
+
+    def __init__(self, ema_period=5, rr=3.0, max_trades_per_day=5, log_capacity=100_000):
         self.ema_period = ema_period
         self.alpha = 2 / (ema_period + 1)
+        self.one_minus_alpha = 1.0 - self.alpha
         self.rr = rr
         self.max_trades_per_day = max_trades_per_day
-
-        # Per-symbol state so multiple symbols can share one object
-        self.state = defaultdict(self._new_symbol_state)
-
-    def _new_symbol_state(self):
-        return {
-            "ema_short": None,
-            "ema_long": None,
-            "signal_short": None,
-            "signal_long": None,
-            # strategy owns position; backtest/bot reads it and calls force_flat on exit
-            "position": None,  # {"side": "long"/"short", "entry": e, "sl": sl, "tp": tp, "trade_id": int}
-            "trades_today": 0,
-            "current_day": None,
-            "next_trade_id": 1,
-        }
-
-    def _reset_day_if_needed(self, st, ts):
-        day = time.strftime("%Y-%m-%d", time.localtime(ts))
-        if st["current_day"] != day:
-            st["current_day"] = day
-            st["trades_today"] = 0
-
-    def _can_trade(self, st, ts):
-        self._reset_day_if_needed(st, ts)
-        return st["trades_today"] < self.max_trades_per_day
-
-    def _record_trade(self, st):
-        st["trades_today"] += 1
-        trade_id = st["next_trade_id"]
-        st["next_trade_id"] += 1
+        # local UTC offset in seconds, so (ts + offset) // 86400 buckets by local day
+        self._tz_offset = _local_utc_offset()
+
+        # Per-symbol state so multiple symbols can share one object:
+        # state[symbol] -> SymbolState, also listed by sid in _rows
+        self._rows = []
+        self.state = _SymbolStates(self._rows, self._add_row)
+        # copies of has_pos / pos_side / pos_stop_bound / pos_take_bound by
+        # sid, kept in step by _open_position() and force_flat(), so
+        # exit_signal_vec() is a pure array comparison
+        self._pos_open = np.zeros(16, dtype=np.bool_)
+        self._pos_side = np.zeros(16)
+        self._pos_stop = np.zeros(16)
+        self._pos_take = np.zeros(16)
+        # every entry signal, the last log_capacity of them kept
+        self._entries = _EntryLog(log_capacity)
+
+    def _add_row(self, sid):
+        if sid == self._pos_open.shape[0]:
+            # double the exit columns, like PaperTrader's per-symbol arrays
+            self._pos_open = np.concatenate([self._pos_open, np.zeros_like(self._pos_open)])
+            self._pos_side = np.concatenate([self._pos_side, np.zeros_like(self._pos_side)])
+            self._pos_stop = np.concatenate([self._pos_stop, np.zeros_like(self._pos_stop)])
+            self._pos_take = np.concatenate([self._pos_take, np.zeros_like(self._pos_take)])
+
+    def _warm_ema(self, st, c, short_side):
+        # one close into a warming-up EMA; NaN until ema_period closes are in
+        if short_side:
+            n = st.ema_short_n = st.ema_short_n + 1
+            total = st.ema_short_sum = st.ema_short_sum + c
+        else:
+            n = st.ema_long_n = st.ema_long_n + 1
+            total = st.ema_long_sum = st.ema_long_sum + c
+        return total / self.ema_period if n == self.ema_period else float("nan")
+
+    def _open_position(self, st, side, entry, sl, tp, ts):
+        st.trades_today += 1
+        trade_id = st.next_trade_id
+        st.next_trade_id += 1
+        st.has_pos = True
+        st.pos_side = side
+        st.pos_entry = entry
+        st.pos_sl = sl
+        st.pos_tp = tp
+        stop_bound = st.pos_stop_bound = side * sl
+        take_bound = st.pos_take_bound = side * tp
+        st.pos_trade_id = trade_id
+        i = st.sid
+        self._pos_open[i] = True
+        self._pos_side[i] = side
+        self._pos_stop[i] = stop_bound
+        self._pos_take[i] = take_bound
+
+        kind = SIG_LONG_ENTRY if side == LONG else SIG_SHORT_ENTRY
+        self._entries.append(ts, i, kind, entry, sl, tp, trade_id)
         return trade_id
 
+    def entry_columns(self):
+        """
+        Logged entry signals as NumPy columns (ENTRY_LOG_FIELDS), oldest
+        first; at most log_capacity of them. sid maps back to the symbol
+        through symbol_ids() order.
+        """
+        return self._entries.columns()
+
+    def last_trade(self):
+        """The most recent entry signal as a dict (with its symbol), or None."""
+        row = self._entries.last()
+        if row is not None:
+            row["symbol"] = self._rows[row["sid"]].symbol
+        return row
+
     def force_flat(self, symbol):
         """
         Utility for external code to force strategy state flat,
         e.g. after an exit has been executed by the backtest/bot.
         """
-        st = self.state[symbol]
-        st["position"] = None
-        st["signal_short"] = None
-        st["signal_long"] = None
+        st = self.state.get(symbol)
+        if st is None:
+            return
+        st.has_pos = False
+        st.has_sig_s = False
+        st.has_sig_l = False
+        self._pos_open[st.sid] = False
 
     def update_candle(self, symbol, o, h, l, c, ts, tf_minutes):
         """
         Feed one completed candle (OHLC) for a given symbol and timeframe.
 
         Returns:
-            None, or dict:
-              {
-                "symbol": symbol,
-                "signal": "long_entry"/"short_entry",
-                "entry": float,
-                "sl": float,
-                "tp": float,
-                "trade_id": int
-              }
+            None, or Signal(kind=SHORT_ENTRY/LONG_ENTRY, entry, sl, tp,
+            exit_price=nan, trade_id).
         Exit SL/TP is handled via exit_signal() separately.
+        For a feed of one timeframe, candle_updater() skips the tf dispatch.
         """
-        st = self.state[symbol]
-        self._reset_day_if_needed(st, ts)
+        if tf_minutes == 5:
+            return self._step_5m(self.state[symbol], o, h, l, c, ts)
+        if tf_minutes == 15:
+            return self._step_15m(self.state[symbol], o, h, l, c, ts)
+        return None
 
-        # Update EMA
+    def candle_updater(self, tf_minutes):
+        """
+        update_candle() fixed to one timeframe: a bound
+        fn(symbol, o, h, l, c, ts) returning the same result.
+        """
         if tf_minutes == 5:
-            if st["ema_short"] is None:
-                st["ema_short"] = c
-            else:
-                st["ema_short"] = self.alpha * c + (1 - self.alpha) * st["ema_short"]
-        elif tf_minutes == 15:
-            if st["ema_long"] is None:
-                st["ema_long"] = c
-            else:
-                st["ema_long"] = self.alpha * c + (1 - self.alpha) * st["ema_long"]
-        else:
-            return None
+            return self._update_5m
+        if tf_minutes == 15:
+            return self._update_15m
+        raise ValueError(f"unsupported timeframe: {tf_minutes}m")
 
-        # If already in position, do not generate new entries here
-        if st["position"] is not None:
-            return None
+    def bind(self, symbol):
+        """SymbolStream for symbol: per-bar updates without the symbol lookup."""
+        return SymbolStream(self, symbol)
 
-        # If flat but daily limit reached, ignore new entries
-        if not self._can_trade(st, ts):
-            return None
+    def _update_5m(self, symbol, o, h, l, c, ts):
+        return self._step_5m(self.state[symbol], o, h, l, c, ts)
 
-        # SHORT SIDE (5m)
-        if tf_minutes == 5 and st["ema_short"] is not None:
-            ema_short = st["ema_short"]
+    def _update_15m(self, symbol, o, h, l, c, ts):
+        return self._step_15m(self.state[symbol], o, h, l, c, ts)
 
-            if st["signal_short"] is None:
-                if h > ema_short and l > ema_short:
-                    st["signal_short"] = {"high": h, "low": l}
+    def _step_5m(self, st, o, h, l, c, ts):
+        # SHORT SIDE (5m)
+        # new local day bucket: reset the daily trade count
+        day = int((ts + self._tz_offset) // 86400)
+        if st.current_day != day:
+            st.current_day = day
+            st.trades_today = 0
+
+        # Update EMA (kept in a local for the signal checks below)
+        ema = st.ema_short
+        if ema == ema:
+            ema = self.alpha * c + self.one_minus_alpha * ema
+        else:
+            ema = self._warm_ema(st, c, True)
+            if ema != ema:
                 return None
+        st.ema_short = ema
+
+        # If already in position, or flat but daily limit reached, no new entries
+        if st.has_pos or st.trades_today >= self.max_trades_per_day:
+            return None
+
+        if not st.has_sig_s:
+            if h > ema and l > ema:
+                st.has_sig_s = True
+                st.sig_s_hi = h
+                st.sig_s_lo = l
+            return None
 
-            sig = st["signal_short"]
-
-            if c < sig["low"]:
-                entry = c
-                sl = sig["high"]
-                risk = sl - entry
-                if risk <= 0:
-                    st["signal_short"] = None
-                    return None
-                tp = entry - self.rr * risk
-                trade_id = self._record_trade(st)
-                st["position"] = {
-                    "side": "short",
-                    "entry": entry,
-                    "sl": sl,
-                    "tp": tp,
-                    "trade_id": trade_id,
-                }
-                st["signal_short"] = None
-                return {
-                    "symbol": symbol,
-                    "signal": "short_entry",
-                    "entry": entry,
-                    "sl": sl,
-                    "tp": tp,
-                    "trade_id": trade_id,
-                }
-
-            if l > ema_short and c >= sig["low"]:
-                st["signal_short"] = {"high": h, "low": l}
+        sig_lo = st.sig_s_lo
+        if c < sig_lo:
+            sl = st.sig_s_hi
+            risk = sl - c
+            st.has_sig_s = False
+            if risk <= 0:
                 return None
+            tp = c - self.rr * risk
+            trade_id = self._open_position(st, SHORT, c, sl, tp, ts)
+            return Signal(SignalKind.SHORT_ENTRY, c, sl, tp, float("nan"), trade_id)
 
-            if l <= ema_short:
-                st["signal_short"] = None
+        if l > ema and c >= sig_lo:
+            st.sig_s_hi = h
+            st.sig_s_lo = l
             return None
 
-        # LONG SIDE (15m)
-        if tf_minutes == 15 and st["ema_long"] is not None:
-            ema_long = st["ema_long"]
+        if l <= ema:
+            st.has_sig_s = False
+        return None
 
-            if st["signal_long"] is None:
-                if l < ema_long and h < ema_long:
-                    st["signal_long"] = {"high": h, "low": l}
+    def _step_15m(self, st, o, h, l, c, ts):
+        # LONG SIDE (15m)
+        day = int((ts + self._tz_offset) // 86400)
+        if st.current_day != day:
+            st.current_day = day
+            st.trades_today = 0
+
+        ema = st.ema_long
+        if ema == ema:
+            ema = self.alpha * c + self.one_minus_alpha * ema
+        else:
+            ema = self._warm_ema(st, c, False)
+            if ema != ema:
                 return None
+        st.ema_long = ema
+
+        if st.has_pos or st.trades_today >= self.max_trades_per_day:
+            return None
+
+        if not st.has_sig_l:
+            if l < ema and h < ema:
+                st.has_sig_l = True
+                st.sig_l_hi = h
+                st.sig_l_lo = l
+            return None
 
-            sig = st["signal_long"]
-
-            if c > sig["high"]:
-                entry = c
-                sl = sig["low"]
-                risk = entry - sl
-                if risk <= 0:
-                    st["signal_long"] = None
-                    return None
-                tp = entry + self.rr * risk
-                trade_id = self._record_trade(st)
-                st["position"] = {
-                    "side": "long",
-                    "entry": entry,
-                    "sl": sl,
-                    "tp": tp,
-                    "trade_id": trade_id,
-                }
-                st["signal_long"] = None
-                return {
-                    "symbol": symbol,
-                    "signal": "long_entry",
-                    "entry": entry,
-                    "sl": sl,
-                    "tp": tp,
-                    "trade_id": trade_id,
-                }
-
-            if h < ema_long and c <= sig["high"]:
-                st["signal_long"] = {"high": h, "low": l}
+        sig_hi = st.sig_l_hi
+        if c > sig_hi:
+            sl = st.sig_l_lo
+            risk = c - sl
+            st.has_sig_l = False
+            if risk <= 0:
                 return None
+            tp = c + self.rr * risk
+            trade_id = self._open_position(st, LONG, c, sl, tp, ts)
+            return Signal(SignalKind.LONG_ENTRY, c, sl, tp, float("nan"), trade_id)
 
-            if h >= ema_long:
-                st["signal_long"] = None
+        if h < ema and c <= sig_hi:
+            st.sig_l_hi = h
+            st.sig_l_lo = l
             return None
 
+        if h >= ema:
+            st.has_sig_l = False
         return None
 
+    def update_candles_batch(self, symbol, h, l, c, ts, tf_minutes):
+        """
+        Feed a series of completed candles (high, low, close arrays) for one
+        symbol and timeframe.
+        Leaves the same state as calling update_candle() on each in turn, but
+        the whole series runs as one kernel call.
+
+        Returns:
+            None, or (index, Signal) for the entry fired inside the batch. At
+            most one fires, since no exits are checked here (see exit_signal()).
+        """
+        if tf_minutes not in (5, 15):
+            raise ValueError(f"unsupported tf_minutes={tf_minutes}")
+        c = np.ascontiguousarray(c, dtype=np.float64)
+        if c.shape[0] == 0:
+            return None
+        st = self.state[symbol]
+        short_side = tf_minutes == 5
+        # same local-day bucket as _step_5m() / _step_15m(), also for float ts
+        day = ((np.asarray(ts, dtype=np.float64) + self._tz_offset) // 86400).astype(np.int64)
+
+        if short_side:
+            ema, ema_n, ema_sum = st.ema_short, st.ema_short_n, st.ema_short_sum
+            has_sig, sig_hi, sig_lo = st.has_sig_s, st.sig_s_hi, st.sig_s_lo
+        else:
+            ema, ema_n, ema_sum = st.ema_long, st.ema_long_n, st.ema_long_sum
+            has_sig, sig_hi, sig_lo = st.has_sig_l, st.sig_l_hi, st.sig_l_lo
+
+        k, sl, tp, ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo, trades_today, cur_day = (
+            candle_series(
+                np.ascontiguousarray(h, dtype=np.float64),
+                np.ascontiguousarray(l, dtype=np.float64),
+                c,
+                day,
+                self.alpha,
+                self.ema_period,
+                self.rr,
+                self.max_trades_per_day,
+                short_side,
+                ema,
+                ema_n,
+                ema_sum,
+                has_sig,
+                sig_hi,
+                sig_lo,
+                st.has_pos,
+                st.trades_today,
+                st.current_day,
+            )
+        )
+        if short_side:
+            st.ema_short, st.ema_short_n, st.ema_short_sum = float(ema), int(ema_n), float(ema_sum)
+            st.has_sig_s, st.sig_s_hi, st.sig_s_lo = bool(has_sig), float(sig_hi), float(sig_lo)
+        else:
+            st.ema_long, st.ema_long_n, st.ema_long_sum = float(ema), int(ema_n), float(ema_sum)
+            st.has_sig_l, st.sig_l_hi, st.sig_l_lo = bool(has_sig), float(sig_hi), float(sig_lo)
+
+        result = None
+        if k >= 0:
+            entry = float(c[k])
+            sl = float(sl)
+            tp = float(tp)
+            side = SHORT if short_side else LONG
+            trade_id = self._open_position(st, side, entry, sl, tp, float(np.asarray(ts)[k]))
+            kind = SignalKind.SHORT_ENTRY if short_side else SignalKind.LONG_ENTRY
+            result = int(k), Signal(kind, entry, sl, tp, float("nan"), trade_id)
+        # the kernel's day bookkeeping already counts the entry
+        st.current_day = int(cur_day)
+        st.trades_today = int(trades_today)
+        return result
+
+    def update_batch(self, h, l, c, ts, tf_minutes):
+        """
+        Replay a whole candle series (high, low, close arrays) for one
+        timeframe in a single kernel call (tf_minutes=5 runs the short rules,
+        15 the long rules), with SL/TP exits checked on every close. Does not
+        touch the per-symbol state used by update_candle().
+
+        Returns:
+            (kind, price, sl, tp) NumPy arrays aligned with the candles; kind
+            is a SignalKind code (0 = nothing on that bar), price
+            is the entry or exit price.
+        """
+        if tf_minutes not in (5, 15):
+            raise ValueError(f"unsupported tf_minutes={tf_minutes}")
+        c = np.ascontiguousarray(c, dtype=np.float64)
+        day = (np.asarray(ts, dtype=np.int64) + self._tz_offset) // 86400
+        return run_five_ema(
+            np.ascontiguousarray(h, dtype=np.float64),
+            np.ascontiguousarray(l, dtype=np.float64),
+            c,
+            day,
+            self.alpha,
+            self.ema_period,
+            self.rr,
+            self.max_trades_per_day,
+            tf_minutes == 5,
+        )
+
+    def symbol_ids(self, symbols):
+        """Symbol ids for `symbols` (new symbols get a state), for exit_signal_vec()."""
+        state = self.state
+        return np.array([state[s].sid for s in symbols], dtype=np.int64)
+
+    def exit_signal_vec(self, sids, prices):
+        """
+        exit_signal() for many symbols at once, as masks: prices aligned with
+        `sids` (from symbol_ids()); NaN prices never exit.
+
+        Returns:
+            int8 array of SignalKind codes aligned with sids (EXIT_SL,
+            EXIT_TP, or NONE for no exit / no open position). The exit price
+            is state[symbol].pos_sl / pos_tp; positions stay open until
+            force_flat().
+        """
+        return _exit_kinds(
+            self._pos_open[sids],
+            self._pos_side[sids],
+            self._pos_stop[sids],
+            self._pos_take[sids],
+            prices,
+        )
+
     def exit_signal(self, symbol, price):
         """
         Check if current price triggers SL/TP for the open position.
 
         Returns:
-            None or dict:
-              {
-                "symbol": symbol,
-                "signal": "exit_sl"/"exit_tp",
-                "exit_price": float,
-                "trade_id": int,
-                "side": "long"/"short"
-              }
+            None, or Signal(kind=EXIT_SL/EXIT_TP, entry, sl, tp, exit_price,
+            trade_id). The side is state[symbol].pos_side.
         """
-        st = self.state[symbol]
-        pos = st["position"]
-        if pos is None:
+        st = self.state.get(symbol)
+        if st is None or not st.has_pos:
             return None
 
-        side = pos["side"]
-        sl = pos["sl"]
-        tp = pos["tp"]
-
-        if side == "short":
-            if price >= sl:
-                exit_price = sl
-                sig = "exit_sl"
-            elif price <= tp:
-                exit_price = tp
-                sig = "exit_tp"
-            else:
-                return None
-        else:  # long
-            if price <= sl:
-                exit_price = sl
-                sig = "exit_sl"
-            elif price >= tp:
-                exit_price = tp
-                sig = "exit_tp"
-            else:
-                return None
-
-        trade_id = pos["trade_id"]
+        sl = st.pos_sl
+        tp = st.pos_tp
+
+        # one code path for both sides: flip the price by pos_side and compare
+        # against the signed bounds set in _open_position()
+        signed_price = st.pos_side * price
+        if signed_price <= st.pos_stop_bound:
+            exit_price = sl
+            kind = SignalKind.EXIT_SL
+        elif signed_price >= st.pos_take_bound:
+            exit_price = tp
+            kind = SignalKind.EXIT_TP
+        else:
+            return None
 
         # Strategy keeps position until force_flat() is called externally
-        return {
-            "symbol": symbol,
-            "signal": sig,
-            "exit_price": exit_price,
-            "trade_id": trade_id,
-            "side": side,
-        }
+        return Signal(kind, st.pos_entry, sl, tp, exit_price, st.pos_trade_id)
+
+    def exit_scan(self, symbol, prices):
+        """
+        exit_signal() over a price path (e.g. the ticks or closes until the
+        next check), in one vectorized pass.
+
+        Returns:
+            None, or (index, Signal) for the first price that exits.
+        """
+        st = self.state.get(symbol)
+        if st is None or not st.has_pos:
+            return None
+        sl = st.pos_sl
+        tp = st.pos_tp
+        k, kind = exit_scan(prices, sl, tp, st.pos_side)
+        if k < 0:
+            return None
+        exit_price = sl if kind == SIG_EXIT_SL else tp
+        return k, Signal(SignalKind(kind), st.pos_entry, sl, tp, exit_price, st.pos_trade_id)
+
+
+class _ColumnRow:
+    """
+    One symbol's row of the FiveEMACrossSection state columns, read and
+    written through the field names (st.has_pos, ...) as plain Python values.
+    """
+
+    __slots__ = ("_owner", "_i")
+
+    def __init__(self, owner, i):
+        self._owner = owner
+        self._i = i
+
+
+def _column_property(name, to_py):
+    def get(self):
+        return to_py(getattr(self._owner, name)[self._i])
+
+    def set(self, value):
+        getattr(self._owner, name)[self._i] = value
+
+    return property(get, set)
+
+
+for _name, _dtype, _ in STATE_FIELDS:
+    setattr(_ColumnRow, _name, _column_property(_name, _PY_TYPES.get(_dtype, int)))
+
+
+class FiveEMACrossSection:
+    """
+    FiveEMA's rules for a fixed list of symbols whose candles close together
+    (one candle per symbol per update), with the per-symbol state held as one
+    NumPy column per STATE_FIELDS entry so each update is one kernel call
+    over all symbols. Same signals as FiveEMA.update_candle() per symbol.
+    """
+
+    __slots__ = (
+        "symbols",
+        "ema_period",
+        "alpha",
+        "rr",
+        "max_trades_per_day",
+        "state",
+        "_sids",
+        "_tz_offset",
+        "_entries",
+    ) + tuple(name for name, _, _ in STATE_FIELDS)
+
+    def __init__(
+        self, symbols, ema_period=5, rr=3.0, max_trades_per_day=5, log_capacity=100_000
+    ):
+        self.symbols = list(symbols)
+        self.ema_period = ema_period
+        self.alpha = 2 / (ema_period + 1)
+        self.rr = rr
+        self.max_trades_per_day = max_trades_per_day
+        self._tz_offset = _local_utc_offset()
+        n = len(self.symbols)
+        self._sids = np.arange(n, dtype=np.int64)
+        for name, dtype, init in STATE_FIELDS:
+            setattr(self, name, np.full(n, init, dtype=dtype))
+        # state[symbol] -> view of that symbol's row
+        self.state = {s: _ColumnRow(self, i) for i, s in enumerate(self.symbols)}
+        # every entry signal, as in FiveEMA; sid is the index into symbols
+        self._entries = _EntryLog(log_capacity)
+
+    def force_flat(self, symbol):
+        """Same as FiveEMA.force_flat()."""
+        i = self.state[symbol]._i
+        self.has_pos[i] = False
+        self.has_sig_s[i] = False
+        self.has_sig_l[i] = False
+
+    def update_cross_section(self, o, h, l, c, ts, tf_minutes):
+        """
+        Feed one completed candle per symbol, all closing at `ts`; o/h/l/c
+        are arrays aligned with `symbols`.
+
+        Returns:
+            list of (k, Signal) for the k-th symbols that entered a position.
+        """
+        if tf_minutes not in (5, 15):
+            raise ValueError(f"unsupported tf_minutes={tf_minutes}")
+        short_side = tf_minutes == 5
+        c = np.ascontiguousarray(c, dtype=np.float64)
+        kind, sl, tp, trade_id = cross_section_step(
+            self._sids,
+            np.ascontiguousarray(h, dtype=np.float64),
+            np.ascontiguousarray(l, dtype=np.float64),
+            c,
+            int((ts + self._tz_offset) // 86400),
+            self.alpha,
+            self.ema_period,
+            self.rr,
+            self.max_trades_per_day,
+            short_side,
+            self.ema_short if short_side else self.ema_long,
+            self.ema_short_n if short_side else self.ema_long_n,
+            self.ema_short_sum if short_side else self.ema_long_sum,
+            self.has_sig_s if short_side else self.has_sig_l,
+            self.sig_s_hi if short_side else self.sig_l_hi,
+            self.sig_s_lo if short_side else self.sig_l_lo,
+            self.has_pos,
+            self.pos_side,
+            self.pos_entry,
+            self.pos_sl,
+            self.pos_tp,
+            self.pos_stop_bound,
+            self.pos_take_bound,
+            self.pos_trade_id,
+            self.trades_today,
+            self.current_day,
+            self.next_trade_id,
+        )
+
+        # Python only touches the rows that fired
+        fired = np.flatnonzero(kind)
+        if fired.size == 0:
+            return []
+        self._entries.extend(
+            ts, fired, kind[fired], c[fired], sl[fired], tp[fired], trade_id[fired]
+        )
+        nan = float("nan")
+        sig_kind = SignalKind.SHORT_ENTRY if short_side else SignalKind.LONG_ENTRY
+        return [
+            (k, Signal(sig_kind, float(c[k]), float(sl[k]), float(tp[k]), nan, int(trade_id[k])))
+            for k in fired.tolist()
+        ]
+
+    def entry_columns(self):
+        """Same as FiveEMA.entry_columns(); sid indexes `symbols`."""
+        return self._entries.columns()
+
+    def last_trade(self):
+        """Same as FiveEMA.last_trade()."""
+        row = self._entries.last()
+        if row is not None:
+            row["symbol"] = self.symbols[row["sid"]]
+        return row
+
+    def exit_signal_vec(self, prices):
+        """
+        FiveEMA.exit_signal() for every symbol at once: prices aligned with
+        `symbols`, NaN never exits. Returns an int8 SignalKind code array.
+        """
+        return _exit_kinds(
+            self.has_pos, self.pos_side, self.pos_stop_bound, self.pos_take_bound, prices
+        )
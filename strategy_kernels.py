@@ -0,0 +1,344 @@
+"""
+Numeric kernels behind FiveEMA's batch paths.
+
+If build_kernels_aot.py has been run and its strategy_kernels_aot module
+matches KERNELS_VERSION, the public kernels come from there and numba is not
+imported at all. Otherwise they are compiled with numba on first call (or
+loaded from numba's on-disk cache); without numba the same functions run as
+plain Python (slow, but identical results).
+"""
+import numpy as np
+
+# bump on any change to the kernels or their signatures: an AOT build made
+# from another version is ignored
+KERNELS_VERSION = 3
+
+try:  # ahead-of-time build, see build_kernels_aot.py
+    import strategy_kernels_aot as _aot
+except ImportError:
+    _aot = None
+if _aot is not None:
+    # builds from before the version check have no kernels_version()
+    _aot_version = _aot.kernels_version() if hasattr(_aot, "kernels_version") else None
+    if _aot_version != KERNELS_VERSION:
+        print(
+            f"strategy_kernels: ignoring stale strategy_kernels_aot build "
+            f"(version {_aot_version}, expected {KERNELS_VERSION}); "
+            f"re-run build_kernels_aot.py"
+        )
+        _aot = None
+
+
+def _plain_njit(*args, **kwargs):
+    if len(args) == 1 and callable(args[0]) and not kwargs:
+        return args[0]
+    return lambda f: f
+
+
+if _aot is None:
+    try:
+        from numba import njit
+    except ImportError:  # optional dependency
+        njit = _plain_njit
+else:
+    # the AOT kernels replace the public functions below; these stay plain Python
+    njit = _plain_njit
+
+
+# signal codes emitted by the kernels
+SIG_NONE = 0
+SIG_SHORT_ENTRY = 1
+SIG_LONG_ENTRY = 2
+SIG_EXIT_SL = 3
+SIG_EXIT_TP = 4
+
+# numba signatures of the public kernels, for build_kernels_aot.py; the JIT
+# kernels compile lazily for the argument types they are called with
+CANDLE_SERIES_SIG = (
+    "Tuple((int64, float64, float64, float64, int64, float64, boolean, float64,"
+    " float64, int64, int64))"
+    "(float64[:], float64[:], float64[:], int64[:], float64, int64, float64, int64,"
+    " boolean, float64, int64, float64, boolean, float64, float64, boolean, int64,"
+    " int64)"
+)
+CROSS_SECTION_SIG = (
+    "Tuple((int8[:], float64[:], float64[:], int64[:]))"
+    "(int64[:], float64[:], float64[:], float64[:], int64, float64, int64, float64,"
+    " int64, boolean, float64[:], int32[:], float64[:], boolean[:], float64[:],"
+    " float64[:], boolean[:], int8[:],"
+    " float64[:], float64[:], float64[:], float64[:], float64[:], int64[:], int32[:],"
+    " int64[:], int64[:])"
+)
+RUN_FIVE_EMA_SIG = (
+    "Tuple((int8[:], float64[:], float64[:], float64[:]))"
+    "(float64[:], float64[:], float64[:], int64[:], float64, int64,"
+    " float64, int64, boolean)"
+)
+
+
+@njit(cache=True, inline="always")
+def _ema_update(prev, x, alpha):
+    """One EMA step; inlined into the kernels below."""
+    return alpha * x + (1.0 - alpha) * prev
+
+
+@njit(cache=True, inline="always")
+def _ema_warm_step(ema, n, acc, x, alpha, period):
+    """
+    One close into an EMA seeded with the SMA of its first `period` closes.
+    Until then ema is NaN and acc holds the sum of the n closes seen so far.
+
+    Returns (ema, n, acc).
+    """
+    if ema == ema:
+        return _ema_update(ema, x, alpha), n, acc
+    n += 1
+    acc += x
+    if n == period:
+        return acc / period, n, acc
+    return np.nan, n, acc
+
+
+@njit(cache=True, inline="always")
+def _entry_step(hi, lo, cl, ema, has_sig, sig_hi, sig_lo, rr, short_side):
+    """
+    One candle of the entry rules (5m short / 15m long), for a flat position
+    under the daily cap.
+
+    Returns (entered, sl, tp, has_sig, sig_hi, sig_lo).
+    """
+    if short_side:
+        if not has_sig:
+            if hi > ema and lo > ema:
+                return False, 0.0, 0.0, True, hi, lo
+        elif cl < sig_lo:
+            risk = sig_hi - cl
+            if risk > 0:
+                return True, sig_hi, cl - rr * risk, False, sig_hi, sig_lo
+            return False, 0.0, 0.0, False, sig_hi, sig_lo
+        elif lo > ema and cl >= sig_lo:
+            return False, 0.0, 0.0, True, hi, lo
+        elif lo <= ema:
+            return False, 0.0, 0.0, False, sig_hi, sig_lo
+    else:
+        if not has_sig:
+            if lo < ema and hi < ema:
+                return False, 0.0, 0.0, True, hi, lo
+        elif cl > sig_hi:
+            risk = cl - sig_lo
+            if risk > 0:
+                return True, sig_lo, cl + rr * risk, False, sig_hi, sig_lo
+            return False, 0.0, 0.0, False, sig_hi, sig_lo
+        elif hi < ema and cl <= sig_hi:
+            return False, 0.0, 0.0, True, hi, lo
+        elif hi >= ema:
+            return False, 0.0, 0.0, False, sig_hi, sig_lo
+    return False, 0.0, 0.0, has_sig, sig_hi, sig_lo
+
+
+@njit(cache=True, inline="always")
+def _candle_step(
+    hi, lo, cl, day, alpha, period, rr, max_trades, short_side,
+    ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo, has_pos, trades_today, cur_day,
+):
+    """
+    One candle of FiveEMA for one symbol, on scalars: the compiled form of
+    FiveEMA._step_5m() (short_side) / _step_15m(). Every kernel below runs
+    its candles through this one function; opening the position on an entry
+    is left to the caller, trades_today already counts it.
+
+    Returns (entered, sl, tp, ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo,
+    trades_today, cur_day).
+    """
+    if day != cur_day:
+        cur_day = day
+        trades_today = 0
+
+    ema, ema_n, ema_sum = _ema_warm_step(ema, ema_n, ema_sum, cl, alpha, period)
+
+    # no entries while the EMA warms up
+    entered = False
+    sl = np.nan
+    tp = np.nan
+    if ema == ema and not has_pos and trades_today < max_trades:
+        entered, e_sl, e_tp, has_sig, sig_hi, sig_lo = _entry_step(
+            hi, lo, cl, ema, has_sig, sig_hi, sig_lo, rr, short_side
+        )
+        if entered:
+            sl = e_sl
+            tp = e_tp
+            trades_today += 1
+    return (
+        entered, sl, tp, ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo,
+        trades_today, cur_day,
+    )
+
+
+@njit(cache=True)
+def cross_section_step(
+    sids, h, l, c, day, alpha, period, rr, max_trades, short_side,
+    ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo, has_pos, pos_side, pos_entry,
+    pos_sl, pos_tp, stop_bound, take_bound, pos_trade_id, trades_today,
+    current_day, next_trade_id,
+):
+    """
+    One candle for many symbols closing at the same time: candle k updates
+    row sids[k] of FiveEMACrossSection's state columns (modified in place)
+    exactly as update_candle() would. sids must be unique. A plain serial
+    loop: a cross-section is a handful of symbols, too few for numba's
+    parallel=True thread pool to pay for itself (measured slower even at
+    500 symbols).
+
+    Returns (kind, sl, tp, trade_id) arrays aligned with sids; kind is
+    SIG_NONE or the entry code, and the entry price is c[k].
+    """
+    n = sids.shape[0]
+    kind = np.zeros(n, dtype=np.int8)
+    sl_out = np.full(n, np.nan)
+    tp_out = np.full(n, np.nan)
+    id_out = np.zeros(n, dtype=np.int64)
+    entry_code = SIG_SHORT_ENTRY if short_side else SIG_LONG_ENTRY
+    side = -1 if short_side else 1
+
+    for k in range(n):
+        i = sids[k]
+        (
+            entered, sl, tp, ema[i], ema_n[i], ema_sum[i], has_sig[i],
+            sig_hi[i], sig_lo[i], trades_today[i], current_day[i],
+        ) = _candle_step(
+            h[k], l[k], c[k], day, alpha, period, rr, max_trades, short_side,
+            ema[i], ema_n[i], ema_sum[i], has_sig[i], sig_hi[i], sig_lo[i],
+            has_pos[i], trades_today[i], current_day[i],
+        )
+        if entered:
+            trade_id = next_trade_id[i]
+            next_trade_id[i] = trade_id + 1
+            has_pos[i] = True
+            pos_side[i] = side
+            pos_entry[i] = c[k]
+            pos_sl[i] = sl
+            pos_tp[i] = tp
+            stop_bound[i] = side * sl
+            take_bound[i] = side * tp
+            pos_trade_id[i] = trade_id
+            kind[k] = entry_code
+            sl_out[k] = sl
+            tp_out[k] = tp
+            id_out[k] = trade_id
+
+    return kind, sl_out, tp_out, id_out
+
+
+@njit(cache=True)
+def candle_series(
+    h, l, c, day, alpha, period, rr, max_trades, short_side,
+    ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo, has_pos, trades_today, cur_day,
+):
+    """
+    A series of candles for one symbol, starting from its state, as
+    update_candle() would one candle at a time. No exits are checked, so at
+    most one entry fires.
+
+    Returns (entry_index or -1, sl, tp, ema, ema_n, ema_sum, has_sig,
+    sig_hi, sig_lo, trades_today, cur_day), the last eight being the state
+    after the final candle.
+    """
+    entry_i = -1
+    sl = np.nan
+    tp = np.nan
+    for i in range(c.shape[0]):
+        (
+            entered, e_sl, e_tp, ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo,
+            trades_today, cur_day,
+        ) = _candle_step(
+            h[i], l[i], c[i], day[i], alpha, period, rr, max_trades, short_side,
+            ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo, has_pos, trades_today,
+            cur_day,
+        )
+        if entered:
+            entry_i = i
+            sl = e_sl
+            tp = e_tp
+            has_pos = True
+    return (
+        entry_i, sl, tp, ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo,
+        trades_today, cur_day,
+    )
+
+
+@njit(cache=True)
+def run_five_ema(h, l, c, day, alpha, period, rr, max_trades, short_side):
+    """
+    Replay one timeframe's candles through the FiveEMA state machine.
+
+    short_side=True applies the 5m short rules, False the 15m long rules.
+    An open position is checked for SL/TP on every close, the way backtest.py
+    calls exit_signal() after update_candle().
+
+    Returns (kind, price, sl, tp) arrays of len(c): kind is a SIG_* code,
+    price is the entry price for entries and the exit price for exits.
+    """
+    n = c.shape[0]
+    kind = np.zeros(n, dtype=np.int8)
+    price = np.full(n, np.nan)
+    sl_out = np.full(n, np.nan)
+    tp_out = np.full(n, np.nan)
+
+    ema = np.nan
+    ema_n = 0
+    ema_sum = 0.0
+    has_sig = False
+    sig_hi = 0.0
+    sig_lo = 0.0
+    has_pos = False
+    pos_sl = 0.0
+    pos_tp = 0.0
+    # exits compare side * close against side * sl / side * tp, so long and
+    # short share one branch-free check
+    side = -1.0 if short_side else 1.0
+    stop_bound = 0.0
+    take_bound = 0.0
+    cur_day = -1
+    trades_today = 0
+
+    for i in range(n):
+        cl = c[i]
+        (
+            entered, e_sl, e_tp, ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo,
+            trades_today, cur_day,
+        ) = _candle_step(
+            h[i], l[i], cl, day[i], alpha, period, rr, max_trades, short_side,
+            ema, ema_n, ema_sum, has_sig, sig_hi, sig_lo, has_pos, trades_today,
+            cur_day,
+        )
+        if entered:
+            has_pos = True
+            pos_sl = e_sl
+            pos_tp = e_tp
+            stop_bound = side * pos_sl
+            take_bound = side * pos_tp
+            kind[i] = SIG_SHORT_ENTRY if short_side else SIG_LONG_ENTRY
+            price[i] = cl
+            sl_out[i] = pos_sl
+            tp_out[i] = pos_tp
+
+        if has_pos:
+            signed_cl = side * cl
+            hit_sl = signed_cl <= stop_bound
+            hit_tp = signed_cl >= take_bound
+            if hit_sl or hit_tp:
+                kind[i] = SIG_EXIT_SL if hit_sl else SIG_EXIT_TP
+                price[i] = pos_sl if hit_sl else pos_tp
+                sl_out[i] = pos_sl
+                tp_out[i] = pos_tp
+                # same as force_flat(): position and pending signal cleared
+                has_pos = False
+                has_sig = False
+
+    return kind, price, sl_out, tp_out
+
+
+if _aot is not None:
+    candle_series = _aot.candle_series
+    cross_section_step = _aot.cross_section_step
+    run_five_ema = _aot.run_five_ema
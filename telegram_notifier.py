@@ -1,20 +1,101 @@
+import queue
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+try:
+    import orjson
+except ImportError:  # optional: falls back to stdlib json encoding
+    orjson = None
+
+try:
+    import h2  # noqa: F401  (needed for httpx's HTTP/2 support)
+    import httpx
+except ImportError:  # optional: falls back to a requests session (HTTP/1.1)
+    httpx = None
+
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
+_TIMEOUT_ERRORS = (requests.exceptions.ReadTimeout,)
+_REQUEST_ERRORS = (requests.exceptions.RequestException,)
+if httpx is not None:
+    _TIMEOUT_ERRORS += (httpx.TimeoutException,)
+    _REQUEST_ERRORS += (httpx.HTTPError,)
 
 
 class TelegramNotifier:
     """
-    Simple Telegram notifier using the Bot API and requests.
+    Simple Telegram notifier using the Bot API, over HTTP/2 with httpx when
+    it is installed (httpx[http2]), else requests.
 
     - Designed for backtests: fails fast on network issues.
     - Never raises on HTTP/network errors; just logs and returns None.
+    - send_async() only queues the message; a background thread posts it,
+      so the caller never waits on Telegram. Call flush() before exiting.
     """
 
-    def __init__(self, bot_token, chat_ids=None, timeout=3):
+    def __init__(self, bot_token, chat_ids=None, timeout=3, queue_size=1024):
         # timeout is per request, in seconds (small on purpose for BT)
         self.bot_token = bot_token
         self.chat_ids = [str(c) for c in (chat_ids or [])]
         self.timeout = timeout
         self.base_url = f"https://api.telegram.org/bot{self.bot_token}/sendMessage"
+        # constant payload fields per (parse_mode, disable_web_page_preview),
+        # merged into each message instead of rebuilt field by field
+        self._skeletons = {}
+        # one pooled keep-alive client, so a burst of sends reuses the TLS
+        # connection (with HTTP/2, concurrent sends share one connection).
+        # Only connection failures are retried: a POST that reached Telegram
+        # may have been delivered, so no read/status retries.
+        # _post(payload) is bound once here for whichever client is available.
+        if httpx is not None:
+            client = httpx.Client(
+                timeout=timeout,
+                transport=httpx.HTTPTransport(
+                    http2=True,
+                    retries=2,
+                    limits=httpx.Limits(max_connections=8, max_keepalive_connections=4),
+                ),
+            )
+            if orjson is not None:
+                self._post = lambda payload: client.post(
+                    self.base_url, content=orjson.dumps(payload), headers=_JSON_HEADERS
+                )
+            else:
+                self._post = lambda payload: client.post(self.base_url, json=payload)
+        else:
+            sess = requests.Session()
+            sess.mount(
+                "https://",
+                HTTPAdapter(
+                    pool_connections=4,
+                    pool_maxsize=8,
+                    max_retries=Retry(total=2, read=0, status=0, backoff_factor=0.2),
+                ),
+            )
+            if orjson is not None:
+                self._post = lambda payload: sess.post(
+                    self.base_url,
+                    data=orjson.dumps(payload),
+                    headers=_JSON_HEADERS,
+                    timeout=self.timeout,
+                )
+            else:
+                self._post = lambda payload: sess.post(
+                    self.base_url, json=payload, timeout=self.timeout
+                )
+        # each broadcast posts to all chats at once on these threads
+        self._pool = ThreadPoolExecutor(
+            max_workers=max(1, min(8, len(self.chat_ids))),
+            thread_name_prefix="telegram",
+        )
+        # outbound broadcasts, drained in order by _worker
+        self._queue = queue.Queue(maxsize=queue_size)
+        threading.Thread(target=self._worker, name="telegram-sender", daemon=True).start()
         print(
             f"[DEBUG][TG] TelegramNotifier init: chat_ids={self.chat_ids}, "
             f"timeout={self.timeout}"
@@ -34,22 +115,19 @@ class TelegramNotifier:
         Returns message_id on success, or None on any error.
         """
         chat_id = str(chat_id)
-        payload = {
-            "chat_id": chat_id,
-            "text": text,
-            "disable_web_page_preview": disable_web_page_preview,
-        }
-        if parse_mode:
-            payload["parse_mode"] = parse_mode
+        key = (parse_mode, disable_web_page_preview)
+        skeleton = self._skeletons.get(key)
+        if skeleton is None:
+            skeleton = {"disable_web_page_preview": disable_web_page_preview}
+            if parse_mode:
+                skeleton["parse_mode"] = parse_mode
+            self._skeletons[key] = skeleton
+        payload = {"chat_id": chat_id, "text": text, **skeleton}
         if reply_to_message_id is not None:
             payload["reply_to_message_id"] = reply_to_message_id
 
         try:
-            resp = requests.post(
-                self.base_url,
-                data=payload,
-                timeout=self.timeout,
-            )
+            resp = self._post(payload)
 
             # HTTP status errors
             try:
@@ -73,12 +151,12 @@ class TelegramNotifier:
             print(f"[DEBUG][TG] SENT chat_id={chat_id} message_id={msg_id}")
             return msg_id
 
-        except requests.exceptions.ReadTimeout as e:
+        except _TIMEOUT_ERRORS as e:
             # Short, single-line log; do not re-raise
             print(f"[TELEGRAM ERROR] chat_id={chat_id} timeout={e}")
             return None
-        except requests.exceptions.RequestException as e:
-            # Any other requests-level error (connection, SSL, etc.)
+        except _REQUEST_ERRORS as e:
+            # Any other HTTP-client-level error (connection, SSL, etc.)
             print(f"[TELEGRAM ERROR] chat_id={chat_id} request_error={e}")
             return None
         except Exception as e:
@@ -86,30 +164,112 @@ class TelegramNotifier:
             print(f"[TELEGRAM ERROR] chat_id={chat_id} unexpected_error={e}")
             return None
 
+    def _worker(self):
+        while True:
+            fut, args = self._queue.get()
+            try:
+                # args is None for flush() markers
+                fut.set_result(None if args is None else self._broadcast(*args))
+            except Exception as e:
+                print(f"[TELEGRAM ERROR] send worker unexpected_error={e}")
+                fut.set_result({})
+            finally:
+                self._queue.task_done()
+
     def send(
         self,
         text,
         reply_to_message_id=None,
         parse_mode="HTML",
         disable_web_page_preview=True,
+        reply_map=None,
     ):
         """
-        Broadcast a message to all configured chats using the same reply_to_message_id.
-        Backtest uses a wrapper for per-chat reply IDs.
+        Broadcast to all configured chats and wait for the result. It
+        replies to reply_to_message_id, or per chat to reply_map
+        {chat_id: message_id} when given.
+
+        Returns {chat_id: message_id or None}.
         """
-        results = {}
+        return self.send_async(
+            text, reply_to_message_id, parse_mode, disable_web_page_preview, reply_map
+        ).result()
+
+    def send_async(
+        self,
+        text,
+        reply_to_message_id=None,
+        parse_mode="HTML",
+        disable_web_page_preview=True,
+        reply_map=None,
+    ):
+        """
+        send() without waiting: queues the broadcast and returns immediately.
+
+        Returns a Future for {chat_id: message_id or None}; call .result()
+        only when the ids are needed (e.g. to reply to this message). When
+        the queue is full the message is dropped and the Future holds {}.
+        """
+        fut = Future()
         if not self.chat_ids:
             print("[DEBUG][TG] send() called but chat_ids is empty")
-            return results
+            fut.set_result({})
+            return fut
+
+        args = (text, reply_to_message_id, parse_mode, disable_web_page_preview, reply_map)
+        try:
+            self._queue.put_nowait((fut, args))
+        except queue.Full:
+            print(f"[TELEGRAM ERROR] send queue full, dropping message: {text[:40]!r}")
+            fut.set_result({})
+        return fut
+
+    def flush(self, timeout=None):
+        """Wait until every queued message has been sent. Returns False on timeout."""
+        marker = Future()
+        try:
+            self._queue.put((marker, None), timeout=timeout)
+            marker.result(timeout)
+        except (queue.Full, FutureTimeoutError):
+            return False
+        return True
 
+    def _broadcast(
+        self, text, reply_to_message_id, parse_mode, disable_web_page_preview, reply_map
+    ):
+        """Post to all chats concurrently; {chat_id: message_id or None}."""
+        futures = {}
         for cid in self.chat_ids:
-            msg_id = self.send_to_chat(
+            reply_id = reply_map.get(cid) if reply_map is not None else reply_to_message_id
+            futures[cid] = self._pool.submit(
+                self.send_to_chat,
                 chat_id=cid,
                 text=text,
-                reply_to_message_id=reply_to_message_id,
+                reply_to_message_id=reply_id,
                 parse_mode=parse_mode,
                 disable_web_page_preview=disable_web_page_preview,
             )
-            results[cid] = msg_id
+
+        results = {}
+        for cid, fut in futures.items():
+            try:
+                results[cid] = fut.result()
+            except Exception as e:
+                # send_to_chat already swallows errors; this is the safety net
+                print(f"[TELEGRAM ERROR] chat_id={cid} unexpected_error={e}")
+                results[cid] = None
 
         return results
+
+
+def sent_message_ids(fut, timeout=1.0):
+    """
+    {chat_id: message_id or None} from a send_async() Future, waiting at most
+    `timeout` seconds. If the message is still queued or in flight by then,
+    returns {} so the caller goes on without reply-to instead of blocking.
+    """
+    try:
+        return fut.result(timeout)
+    except FutureTimeoutError:
+        print(f"[TELEGRAM] entry message not sent within {timeout}s, replying without reply-to")
+        return {}
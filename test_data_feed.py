@@ -0,0 +1,147 @@
+"""
+Tests for SimulatedFeed.get_prices() and SmartAPIConnector's token cache
+(no network: SmartConnect is replaced by a fake).
+
+Run with: python -m unittest test_data_feed
+"""
+import json
+import os
+import stat
+import tempfile
+import time
+import unittest
+from unittest import mock
+
+import numpy as np
+
+import data_feed
+from data_feed import SESSION_MAX_AGE, SimulatedFeed, SmartAPIConnector
+
+
+class GetPricesTest(unittest.TestCase):
+    def walk(self, start, steps):
+        """The step-by-step walk get_price() does, floored at 1.0."""
+        price = start
+        out = []
+        for step in steps:
+            price = max(1.0, price + step)
+            out.append(price)
+        return np.array(out)
+
+    def check(self, start, volatility, n, seed):
+        feed = SimulatedFeed(start_price=start, volatility=volatility)
+        np.random.seed(seed)
+        prices = feed.get_prices([f"S{k}" for k in range(n)])
+        np.random.seed(seed)
+        expected = self.walk(start, np.random.uniform(-volatility, volatility, n))
+        np.testing.assert_allclose(prices, expected, rtol=0, atol=1e-9)
+        self.assertEqual(feed.price, float(prices[-1]))
+        return prices
+
+    def test_matches_step_by_step_walk(self):
+        for seed in range(20):
+            self.check(100.0, 0.5, 50, seed)
+
+    def test_floor_at_one(self):
+        # starts near the floor with large steps, so the floor is hit often
+        hit = False
+        for seed in range(20):
+            prices = self.check(1.5, 3.0, 200, seed)
+            hit |= bool(np.any(prices == 1.0))
+        self.assertTrue(hit)
+
+    def test_no_symbols(self):
+        feed = SimulatedFeed(start_price=42.0)
+        self.assertEqual(len(feed.get_prices([])), 0)
+        self.assertEqual(feed.price, 42.0)
+
+
+class FakeSmartConnect:
+    def __init__(self, api_key):
+        self.tokens = {}
+
+    def setAccessToken(self, token):
+        self.tokens["access"] = token
+
+    def setRefreshToken(self, token):
+        self.tokens["refresh"] = token
+
+    def setFeedToken(self, token):
+        self.tokens["feed"] = token
+
+    def setUserId(self, user_id):
+        self.tokens["user"] = user_id
+
+
+SESSION = {
+    "status": True,
+    "data": {"jwtToken": "Bearer JWT", "refreshToken": "R", "feedToken": "F"},
+}
+
+
+class TokenCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.dir.name, "token.json")
+        patcher = mock.patch.object(data_feed, "SmartConnect", FakeSmartConnect)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.addCleanup(self.dir.cleanup)
+
+    def connector(self, client_id="C1"):
+        """A connector that counts login() calls instead of logging in."""
+        logins = []
+        with mock.patch.object(SmartAPIConnector, "login", lambda self: logins.append(1)):
+            conn = SmartAPIConnector("key", client_id, "pw", "totp", {}, token_cache=self.path)
+        return conn, len(logins)
+
+    def save(self, client_id="C1"):
+        conn = object.__new__(SmartAPIConnector)
+        conn.token_cache = self.path
+        conn.client_id = client_id
+        conn._save_session(SESSION)
+
+    def test_no_cache_logs_in(self):
+        _, logins = self.connector()
+        self.assertEqual(logins, 1)
+
+    def test_fresh_cache_is_restored(self):
+        self.save()
+        conn, logins = self.connector()
+        self.assertEqual(logins, 0)
+        self.assertEqual(
+            conn.smart.tokens, {"access": "JWT", "refresh": "R", "feed": "F", "user": "C1"}
+        )
+        self.assertEqual(conn.last_login, os.path.getmtime(self.path))
+
+    def test_stale_cache_logs_in(self):
+        self.save()
+        old = time.time() - SESSION_MAX_AGE - 60
+        os.utime(self.path, (old, old))
+        _, logins = self.connector()
+        self.assertEqual(logins, 1)
+
+    def test_other_client_logs_in(self):
+        self.save(client_id="C2")
+        _, logins = self.connector()
+        self.assertEqual(logins, 1)
+
+    def test_corrupt_cache_logs_in(self):
+        with open(self.path, "w") as f:
+            f.write("{not json")
+        _, logins = self.connector()
+        self.assertEqual(logins, 1)
+
+    def test_saved_owner_only(self):
+        with open(self.path, "w") as f:
+            f.write("{}")
+        os.chmod(self.path, 0o644)
+        self.save()
+        self.assertEqual(stat.S_IMODE(os.stat(self.path).st_mode), 0o600)
+        with open(self.path) as f:
+            self.assertEqual(json.load(f), {"client_id": "C1", "data": SESSION["data"]})
+        self.assertEqual(os.listdir(self.dir.name), ["token.json"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,118 @@
+"""
+Tests for PaperTrader's array-backed positions and ring-buffer trade log.
+
+Run with: python -m unittest test_paper_trader
+"""
+import unittest
+
+import numpy as np
+
+from paper_trader import SIDE_BUY, SIDE_SELL, PaperTrader, TradeRecord
+
+
+class SlotTest(unittest.TestCase):
+    def test_arrays_double_past_max_symbols(self):
+        trader = PaperTrader(max_symbols=2)
+        for k in range(5):
+            trader.buy_market(f"S{k}", k + 1, 10.0, k)
+        self.assertEqual(trader.qty.shape[0], 8)
+        self.assertEqual(trader.avg.shape[0], 8)
+        self.assertEqual(trader.realized.shape[0], 8)
+        for k in range(5):
+            self.assertEqual(trader.position(f"S{k}"), (k + 1.0, 10.0))
+        self.assertEqual(trader.position("unknown"), (0.0, 0.0))
+
+    def test_realized_pnl_grows_arrays(self):
+        trader = PaperTrader(max_symbols=1)
+        trader.record_realized_trade_pnl("A", 1, 2, 100.0, 105.0)
+        self.assertEqual(trader.record_realized_trade_pnl("B", -1, 1, 100.0, 95.0), 5.0)
+        self.assertEqual(trader.realized_pnl, {"A": 10.0, "B": 5.0})
+
+
+class TradeLogTest(unittest.TestCase):
+    def test_empty(self):
+        trader = PaperTrader(log_capacity=3)
+        self.assertEqual(trader.trade_log, [])
+        self.assertEqual(len(trader.trade_columns()["time_ns"]), 0)
+
+    def test_ring_buffer_wraparound(self):
+        trader = PaperTrader(log_capacity=3)
+        for k in range(5):
+            trade = trader.buy_market if k % 2 == 0 else trader.sell_market
+            trade("A" if k < 3 else "B", 1, 100.0 + k, k)
+
+        # capacity 3: trades 0 and 1 have been overwritten, the rest come oldest first
+        cols = trader.trade_columns()
+        np.testing.assert_array_equal(cols["time_ns"], [2, 3, 4])
+        np.testing.assert_array_equal(cols["side"], [SIDE_BUY, SIDE_SELL, SIDE_BUY])
+        np.testing.assert_array_equal(cols["sid"], [0, 1, 1])
+        np.testing.assert_array_equal(cols["price"], [102.0, 103.0, 104.0])
+        self.assertEqual(
+            trader.trade_log,
+            [
+                TradeRecord(2, "BUY", "A", 1, 102.0),
+                TradeRecord(3, "SELL", "B", 1, 103.0),
+                TradeRecord(4, "BUY", "B", 1, 104.0),
+            ],
+        )
+
+    def test_exactly_full(self):
+        trader = PaperTrader(log_capacity=2)
+        trader.buy_market("A", 1, 10.0, 0)
+        trader.sell_market("A", 1, 11.0, 1)
+        self.assertEqual([t.time_ns for t in trader.trade_log], [0, 1])
+
+
+class PnlTest(unittest.TestCase):
+    def setUp(self):
+        self.trader = PaperTrader(starting_cash=10_000.0)
+        self.trader.buy_market("L", 10, 100.0, 0)  # long 10 @ 100
+        self.trader.sell_market("S", 5, 200.0, 1)  # short 5 @ 200
+        # cash: 10_000 - 1_000 + 1_000
+
+    def test_pnl_with_dict_prices(self):
+        pnl = self.trader.pnl({"L": 110.0, "S": 190.0})
+        self.assertEqual(pnl, {"cash": 10_000.0, "unrealized": 150.0, "total": 10_150.0})
+
+    def test_pnl_with_array_prices(self):
+        pnl = self.trader.pnl(np.array([110.0, 210.0]))
+        self.assertEqual(pnl["unrealized"], 100.0 - 50.0)
+
+    def test_missing_price_counts_as_entry(self):
+        # None / absent / NaN prices fall back to the entry price (no move)
+        self.assertEqual(self.trader.pnl({"L": None, "S": 190.0})["unrealized"], 50.0)
+        self.assertEqual(self.trader.pnl({"L": 110.0})["unrealized"], 100.0)
+        self.assertEqual(self.trader.pnl(np.array([np.nan, np.nan]))["unrealized"], 0.0)
+
+    def test_array_prices_not_modified(self):
+        prices = np.array([np.nan, 190.0])
+        self.trader.pnl(prices)
+        self.assertTrue(np.isnan(prices[0]))
+
+    def test_equity_and_mark_to_market(self):
+        prices = {"L": 90.0, "S": 200.0}
+        self.assertEqual(self.trader.mark_to_market(prices), 10_000.0 - 100.0)
+        self.assertEqual(self.trader.equity(prices), self.trader.mark_to_market(prices))
+        self.assertEqual(PaperTrader(starting_cash=5.0).equity({}), 5.0)
+
+    def test_close_and_flip(self):
+        trader = self.trader
+        trader.sell_market("L", 15, 120.0, 2)  # closes the long, flips short 5 @ 120
+        self.assertEqual(trader.position("L"), (-5.0, 120.0))
+        trader.buy_market("S", 5, 180.0, 3)  # closes the short
+        self.assertEqual(trader.position("S"), (0.0, 0.0))
+        self.assertEqual(trader.pnl({"L": 120.0})["unrealized"], 0.0)
+
+    def test_slippage(self):
+        trader = PaperTrader(slippage=0.01)
+        self.assertEqual(trader.buy_market("A", 1, 100.0, 0), (True, 101.0))
+        self.assertEqual(trader.sell_market("A", 1, 100.0, 1), (True, 99.0))
+
+    def test_buy_without_cash(self):
+        trader = PaperTrader(starting_cash=50.0)
+        self.assertEqual(trader.buy_market("A", 1, 100.0, 0), (False, 100.0))
+        self.assertEqual(trader.trade_log, [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,70 @@
+"""
+Tests for smoke_test.load_config()'s pickle cache.
+
+Run with: python -m unittest test_smoke_test
+"""
+import os
+import stat
+import tempfile
+import unittest
+from unittest import mock
+
+import smoke_test
+from smoke_test import load_config
+
+
+class LoadConfigTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.dir.cleanup)
+        self.path = os.path.join(self.dir.name, "config.yaml")
+        self.write("a: 1\n")
+        self.parses = 0
+        real_load = smoke_test.yaml.load
+
+        def counting_load(*args, **kwargs):
+            self.parses += 1
+            return real_load(*args, **kwargs)
+
+        patcher = mock.patch.object(smoke_test.yaml, "load", counting_load)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def write(self, text, mtime_ns=None):
+        with open(self.path, "w") as f:
+            f.write(text)
+        if mtime_ns is not None:
+            os.utime(self.path, ns=(mtime_ns, mtime_ns))
+
+    def test_cache_reused_while_unchanged(self):
+        self.assertEqual(load_config(self.path), {"a": 1})
+        self.assertEqual(load_config(self.path), {"a": 1})
+        self.assertEqual(self.parses, 1)
+        mode = stat.S_IMODE(os.stat(self.path + ".pkl").st_mode)
+        self.assertEqual(mode, 0o600)
+        self.assertEqual(sorted(os.listdir(self.dir.name)), ["config.yaml", "config.yaml.pkl"])
+
+    def test_same_size_new_mtime_invalidates(self):
+        self.write("a: 1\n", mtime_ns=1_000_000_000)
+        load_config(self.path)
+        self.write("a: 2\n", mtime_ns=1_000_000_001)
+        self.assertEqual(load_config(self.path), {"a": 2})
+        self.assertEqual(self.parses, 2)
+
+    def test_same_mtime_new_size_invalidates(self):
+        self.write("a: 1\n", mtime_ns=1_000_000_000)
+        load_config(self.path)
+        self.write("a: 10\n", mtime_ns=1_000_000_000)
+        self.assertEqual(load_config(self.path), {"a": 10})
+        self.assertEqual(self.parses, 2)
+
+    def test_corrupt_cache_is_rebuilt(self):
+        with open(self.path + ".pkl", "wb") as f:
+            f.write(b"not a pickle")
+        self.assertEqual(load_config(self.path), {"a": 1})
+        self.assertEqual(load_config(self.path), {"a": 1})
+        self.assertEqual(self.parses, 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,264 @@
+"""
+Parity tests for FiveEMA's implementations of the same rules: the per-bar
+Python path (update_candle), the single-symbol batch kernels (update_batch,
+update_candles_batch) and the cross-section kernel (FiveEMACrossSection);
+plus the exit and entry-log helpers on hand-made candles.
+
+Run with: python -m unittest test_strategy
+"""
+import unittest
+
+import numpy as np
+
+from strategy import LONG, STATE_FIELDS, FiveEMA, FiveEMACrossSection, SignalKind, exit_scan
+
+# 5-minute candles from 2024-01-01 09:15 (local time), several days' worth
+T0 = 1_704_080_700.0
+N_BARS = 3000
+
+
+def make_candles(seed, n=N_BARS, step=300):
+    rng = np.random.default_rng(seed)
+    c = 100 + np.cumsum(rng.normal(0, 0.3, n))
+    o = c + rng.normal(0, 0.1, n)
+    h = np.maximum(o, c) + rng.uniform(0, 0.5, n)
+    l = np.minimum(o, c) - rng.uniform(0, 0.5, n)
+    ts = T0 + step * np.arange(n)
+    return o, h, l, c, ts
+
+
+def replay_per_bar(strat, symbol, candles, tf, flat_on_exit=True):
+    """update_candle() then exit_signal() on every close, like backtest.py."""
+    o, h, l, c, ts = candles
+    kind = np.zeros(len(c), dtype=np.int8)
+    price = np.full(len(c), np.nan)
+    for k in range(len(c)):
+        sig = strat.update_candle(symbol, o[k], h[k], l[k], c[k], ts[k], tf)
+        if sig is not None:
+            kind[k] = sig.kind
+            price[k] = sig.entry
+        ex = strat.exit_signal(symbol, c[k])
+        if ex is not None and flat_on_exit:
+            kind[k] = ex.kind
+            price[k] = ex.exit_price
+            strat.force_flat(symbol)
+    return kind, price
+
+
+def entry_key(entry):
+    """(index, Signal) without the NaN exit_price, for equality checks."""
+    if entry is None:
+        return None
+    k, sig = entry
+    return k, sig.kind, sig.entry, sig.sl, sig.tp, sig.trade_id
+
+
+def state_row(st):
+    return [getattr(st, name) for name, _, _ in STATE_FIELDS]
+
+
+class ParityTest(unittest.TestCase):
+    def assert_same_state(self, a, b):
+        for name, x, y in zip((f[0] for f in STATE_FIELDS), state_row(a), state_row(b)):
+            if x != x and y != y:  # both NaN
+                continue
+            self.assertEqual(x, y, name)
+
+    def test_update_batch_matches_per_bar(self):
+        for tf in (5, 15):
+            for max_trades in (1, 3, 10_000):
+                candles = make_candles(tf + max_trades, step=tf * 60)
+                strat = FiveEMA(max_trades_per_day=max_trades)
+                kind, price = replay_per_bar(strat, "X", candles, tf)
+                b_kind, b_price, _, _ = strat.update_batch(*candles[1:], tf)
+                self.assertTrue(np.any(kind != 0))
+                np.testing.assert_array_equal(b_kind, kind)
+                np.testing.assert_array_equal(b_price, price)
+
+    def test_update_candles_batch_matches_per_bar(self):
+        for tf in (5, 15):
+            o, h, l, c, ts = make_candles(tf, step=tf * 60)
+            a = FiveEMA(max_trades_per_day=3)
+            b = FiveEMA(max_trades_per_day=3)
+            rng = np.random.default_rng(tf)
+            k = 0
+            entries = 0
+            while k < len(c):
+                m = int(rng.integers(1, 40))
+                ref = None
+                for j in range(k, min(k + m, len(c))):
+                    sig = a.update_candle("X", o[j], h[j], l[j], c[j], ts[j], tf)
+                    if sig is not None:
+                        ref = (j - k, sig)
+                got = b.update_candles_batch(
+                    "X", h[k : k + m], l[k : k + m], c[k : k + m], ts[k : k + m], tf
+                )
+                self.assertEqual(entry_key(got), entry_key(ref))
+                self.assert_same_state(a.state["X"], b.state["X"])
+                if got is not None:
+                    entries += 1
+                    a.force_flat("X")
+                    b.force_flat("X")
+                k += m
+            self.assertGreater(entries, 0)
+
+    def test_cross_section_matches_per_bar(self):
+        symbols = ["A", "B", "C", "D"]
+        data = [make_candles(seed) for seed in range(len(symbols))]
+        ts = data[0][4]
+        per_bar = FiveEMA(max_trades_per_day=3)
+        cross = FiveEMACrossSection(symbols, max_trades_per_day=3)
+        entries = 0
+        for t in range(N_BARS):
+            tf = 15 if t % 3 == 0 else 5
+            o, h, l, c = (np.array([d[f][t] for d in data]) for f in range(4))
+            ref = []
+            for k, s in enumerate(symbols):
+                sig = per_bar.update_candle(s, o[k], h[k], l[k], c[k], ts[t], tf)
+                if sig is not None:
+                    ref.append((k, sig))
+            got = cross.update_cross_section(o, h, l, c, ts[t], tf)
+            self.assertEqual([entry_key(e) for e in got], [entry_key(e) for e in ref])
+            entries += len(got)
+
+            exits = cross.exit_signal_vec(c)
+            for k, s in enumerate(symbols):
+                ex = per_bar.exit_signal(s, c[k])
+                self.assertEqual(exits[k], SignalKind.NONE if ex is None else ex.kind)
+                if ex is not None:
+                    per_bar.force_flat(s)
+                    cross.force_flat(s)
+        self.assertGreater(entries, 0)
+        for s in symbols:
+            self.assert_same_state(per_bar.state[s], cross.state[s])
+
+
+def short_entry(strat, symbol, ts=T0):
+    """
+    Five flat closes at 100 seed the EMA, a candle above it sets the signal
+    candle (h=103, l=101), and a close at 100 enters short: sl=103, tp=91.
+    """
+    for k in range(5):
+        strat.update_candle(symbol, 100.0, 100.0, 100.0, 100.0, ts + 300 * k, 5)
+    strat.update_candle(symbol, 102.0, 103.0, 101.0, 102.0, ts + 1500, 5)
+    return strat.update_candle(symbol, 101.0, 101.5, 99.5, 100.0, ts + 1800, 5)
+
+
+class ExitAndLogTest(unittest.TestCase):
+    def test_short_entry(self):
+        sig = short_entry(FiveEMA(), "X")
+        self.assertEqual(sig.kind, SignalKind.SHORT_ENTRY)
+        self.assertEqual((sig.entry, sig.sl, sig.tp, sig.trade_id), (100.0, 103.0, 91.0, 1))
+
+    def test_exit_signal_vec(self):
+        strat = FiveEMA()
+        sids = strat.symbol_ids(["A", "B"])
+        short_entry(strat, "B")
+        nan = float("nan")
+        cases = ((102.0, SignalKind.NONE), (103.0, SignalKind.EXIT_SL), (91.0, SignalKind.EXIT_TP))
+        for price, kind in cases:
+            kinds = strat.exit_signal_vec(sids, np.array([nan, price]))
+            np.testing.assert_array_equal(kinds, [SignalKind.NONE, kind])
+            ex = strat.exit_signal("B", price)
+            self.assertEqual(SignalKind.NONE if ex is None else ex.kind, kind)
+        strat.force_flat("B")
+        np.testing.assert_array_equal(strat.exit_signal_vec(sids, np.array([nan, 91.0])), [0, 0])
+
+    def test_exit_signal_vec_many_symbols(self):
+        # past the initial capacity of the exit columns, which then grow
+        strat = FiveEMA()
+        symbols = [f"S{k}" for k in range(40)]
+        for s in symbols[::3]:
+            short_entry(strat, s)
+        sids = strat.symbol_ids(symbols)
+        kinds = strat.exit_signal_vec(sids, np.full(len(symbols), 91.0))
+        expected = [SignalKind.EXIT_TP if k % 3 == 0 else 0 for k in range(len(symbols))]
+        np.testing.assert_array_equal(kinds, expected)
+
+    def test_cross_section_exit_signal_vec(self):
+        strat = FiveEMACrossSection(["A", "B"])
+        for k in range(5):
+            strat.update_cross_section(*(np.full(2, 100.0),) * 4, T0 + 300 * k, 5)
+        # only A's candle clears the EMA, so only A gets a signal candle
+        high, low = np.array([103.0, 100.5]), np.array([101.0, 99.5])
+        strat.update_cross_section(np.full(2, 102.0), high, low, np.full(2, 102.0), T0 + 1500, 5)
+        entries = strat.update_cross_section(
+            np.full(2, 101.0), np.full(2, 101.5), np.full(2, 99.5), np.full(2, 100.0), T0 + 1800, 5
+        )
+        self.assertEqual([(k, sig.sl, sig.tp) for k, sig in entries], [(0, 103.0, 91.0)])
+        prices = np.array([91.0, 91.0])
+        np.testing.assert_array_equal(strat.exit_signal_vec(prices), [SignalKind.EXIT_TP, 0])
+        strat.force_flat("A")
+        np.testing.assert_array_equal(strat.exit_signal_vec(prices), [0, 0])
+
+    def test_exit_scan(self):
+        strat = FiveEMA()
+        self.assertIsNone(strat.exit_scan("X", [100.0]))
+        short_entry(strat, "X")
+        self.assertIsNone(strat.exit_scan("X", [101.0, 95.0, 92.0]))
+        k, sig = strat.exit_scan("X", [101.0, 95.0, 90.5, 104.0])
+        self.assertEqual(k, 2)
+        self.assertEqual((sig.kind, sig.exit_price, sig.trade_id), (SignalKind.EXIT_TP, 91.0, 1))
+        # long side, and SL winning when one price is past both levels
+        self.assertEqual(exit_scan([100.0, 98.0], 99.0, 110.0, LONG), (1, SignalKind.EXIT_SL))
+        self.assertEqual(exit_scan([100.0, 111.0], 99.0, 110.0, LONG), (1, SignalKind.EXIT_TP))
+        self.assertEqual(exit_scan([5.0], 10.0, 1.0, LONG), (0, SignalKind.EXIT_SL))
+
+    def test_entry_columns_and_last_trade(self):
+        strat = FiveEMA(log_capacity=2)
+        self.assertIsNone(strat.last_trade())
+        self.assertEqual(len(strat.entry_columns()["ts"]), 0)
+        for k, symbol in enumerate(("A", "B", "A")):
+            short_entry(strat, symbol, T0 + 86400 * k)
+            strat.force_flat(symbol)
+
+        # capacity 2: the first entry has been overwritten, the rest come oldest first
+        cols = strat.entry_columns()
+        sid_a, sid_b = strat.symbol_ids(["A", "B"])
+        np.testing.assert_array_equal(cols["sid"], [sid_b, sid_a])
+        np.testing.assert_array_equal(cols["ts"], [T0 + 86400 + 1800, T0 + 2 * 86400 + 1800])
+        np.testing.assert_array_equal(cols["trade_id"], [1, 2])
+        np.testing.assert_array_equal(cols["kind"], [SignalKind.SHORT_ENTRY] * 2)
+
+        last = strat.last_trade()
+        self.assertEqual(last["symbol"], "A")
+        self.assertEqual(last["kind"], SignalKind.SHORT_ENTRY)
+        self.assertEqual(
+            (last["entry"], last["sl"], last["tp"], last["trade_id"]), (100.0, 103.0, 91.0, 2)
+        )
+
+    def test_cross_section_entry_columns_and_last_trade(self):
+        strat = FiveEMACrossSection(["A", "B", "C"], log_capacity=3)
+        self.assertIsNone(strat.last_trade())
+        flat = np.full(3, 100.0)
+        for day in range(2):
+            ts = T0 + 86400 * day
+            for k in range(5):
+                strat.update_cross_section(flat, flat, flat, flat, ts + 300 * k, 5)
+            # B and C get signal candles; A stays on the EMA
+            high, low = np.array([100.5, 103.0, 103.0]), np.array([99.5, 101.0, 101.0])
+            strat.update_cross_section(flat + 2, high, low, flat + 2, ts + 1500, 5)
+            entries = strat.update_cross_section(
+                flat + 1, flat + 1.5, flat - 0.5, flat, ts + 1800, 5
+            )
+            self.assertEqual([k for k, _ in entries], [1, 2])
+            strat.force_flat("B")
+            strat.force_flat("C")
+
+        # capacity 3: day 0's B entry has been overwritten, the rest come oldest first
+        cols = strat.entry_columns()
+        np.testing.assert_array_equal(cols["sid"], [2, 1, 2])
+        np.testing.assert_array_equal(cols["ts"], [T0 + 1800] + [T0 + 86400 + 1800] * 2)
+        np.testing.assert_array_equal(cols["trade_id"], [1, 2, 2])
+        np.testing.assert_array_equal(cols["kind"], [SignalKind.SHORT_ENTRY] * 3)
+
+        last = strat.last_trade()
+        self.assertEqual(last["symbol"], "C")
+        self.assertEqual(last["kind"], SignalKind.SHORT_ENTRY)
+        self.assertEqual(
+            (last["entry"], last["sl"], last["tp"], last["trade_id"]), (100.0, 103.0, 91.0, 2)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
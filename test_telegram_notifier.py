@@ -0,0 +1,80 @@
+"""
+Tests for TelegramNotifier's send queue (no network: send_to_chat is
+replaced on the instance).
+
+Run with: python -m unittest test_telegram_notifier
+"""
+import threading
+import unittest
+
+from telegram_notifier import TelegramNotifier, sent_message_ids
+
+
+class SendQueueTest(unittest.TestCase):
+    def notifier(self, chat_ids=("1", "2"), queue_size=1024):
+        n = TelegramNotifier("token", chat_ids=list(chat_ids), queue_size=queue_size)
+        self.sent = []
+        self.started = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+        def send_to_chat(chat_id, text, reply_to_message_id=None, **kwargs):
+            self.started.set()
+            self.release.wait(5)
+            self.sent.append((chat_id, text, reply_to_message_id))
+            return len(self.sent)
+
+        n.send_to_chat = send_to_chat
+        return n
+
+    def test_send_blocks_and_returns_ids(self):
+        n = self.notifier(chat_ids=("1",))
+        self.assertEqual(n.send("a"), {"1": 1})
+        self.assertEqual(n.send("b", reply_to_message_id=1), {"1": 2})
+        self.assertEqual(self.sent, [("1", "a", None), ("1", "b", 1)])
+
+    def test_send_async_and_reply_map(self):
+        n = self.notifier()
+        fut = n.send_async("a", reply_map={"1": 10, "2": 20})
+        self.assertEqual(set(fut.result(5)), {"1", "2"})
+        self.assertEqual(sorted(self.sent), [("1", "a", 10), ("2", "a", 20)])
+
+    def test_no_chats(self):
+        n = self.notifier(chat_ids=())
+        self.assertEqual(n.send("a"), {})
+        self.assertEqual(n.send_async("a").result(0), {})
+
+    def test_queue_full_drops_message(self):
+        n = self.notifier(chat_ids=("1",), queue_size=1)
+        self.release.clear()
+        first = n.send_async("first")
+        self.assertTrue(self.started.wait(5))  # worker is busy with "first"
+        second = n.send_async("second")  # fills the queue
+        dropped = n.send_async("dropped")
+        self.assertEqual(dropped.result(0), {})
+        self.assertFalse(second.done())
+        self.release.set()
+        self.assertTrue(n.flush(timeout=5))
+        self.assertTrue(first.done() and second.done())
+        self.assertEqual([text for _, text, _ in self.sent], ["first", "second"])
+
+    def test_flush_timeout(self):
+        n = self.notifier(chat_ids=("1",))
+        self.release.clear()
+        fut = n.send_async("slow")
+        self.assertFalse(n.flush(timeout=0.05))
+        self.assertEqual(sent_message_ids(fut, timeout=0.01), {})
+        self.release.set()
+        self.assertTrue(n.flush(timeout=5))
+        self.assertEqual(sent_message_ids(fut), {"1": 1})
+
+    def test_flush_waits_for_queued_sends(self):
+        n = self.notifier()
+        futures = [n.send_async(str(k)) for k in range(20)]
+        self.assertTrue(n.flush(timeout=5))
+        self.assertTrue(all(f.done() for f in futures))
+        self.assertEqual(len(self.sent), 40)
+
+
+if __name__ == "__main__":
+    unittest.main()